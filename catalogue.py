@@ -0,0 +1,160 @@
+import json
+import logging
+import re
+from collections.abc import Callable, Iterator
+from itertools import chain
+from typing import Any, NoReturn, TextIO, TypeVar
+
+from create_recipes import IngredientNotFound
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Characters read at once from catalogue files.
+CHUNK_SIZE = 1 << 16
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class CatalogueRecordError(ValueError):
+    """Record of a catalogue file that can't be read or built.
+
+    Properties:
+    - line: line of the file (1-based) where the record starts.
+    """
+
+    def __init__(self, path: str, line: int, message: str):
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+        self.message = message
+
+
+def log_record_error(error: CatalogueRecordError):
+    logger.warning("Skipped catalogue record: %s", error)
+
+
+def iter_records(
+    f: TextIO, path: str = "<catalogue>", chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[int, Any]]:
+    """Yields (line, record) of a JSON array or NDJSON file, one at a time.
+
+    Only one record (and a chunk of text) is held in memory at once. NDJSON
+    lines that aren't valid JSON are yielded as `CatalogueRecordError`
+    records, while syntax errors in an array raise it, as the rest of the
+    array can't be read.
+
+    Args:
+    - f: file, read from its current position.
+    - path: name of the file in errors.
+    """
+    first = f.read(chunk_size)
+    start = len(first) - len(first.lstrip())
+    if first[start : start + 1] == "[":
+        yield from _iter_array(f, path, chunk_size, first)
+    else:
+        yield from _iter_lines(f, path, first)
+
+
+def _iter_lines(f: TextIO, path: str, first: str) -> Iterator[tuple[int, Any]]:
+    # `first` may end mid-line, the rest of which is the first line of `f`.
+    rest = f.readline() if first and not first.endswith("\n") else ""
+    lines = (first + rest).splitlines()
+    for line, text in enumerate(chain(lines, f), start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as e:
+            yield line, CatalogueRecordError(path, line, e.msg)
+
+
+def _iter_array(
+    f: TextIO, path: str, chunk_size: int, first: str
+) -> Iterator[tuple[int, Any]]:
+    decoder = json.JSONDecoder()
+    buffer, position, line = first, 0, 1
+    done = False
+
+    def advance(to: int):
+        nonlocal position, line
+        line += buffer.count("\n", position, to)
+        position = to
+
+    def fill() -> bool:
+        """Reads another chunk, returns whether there was any."""
+        nonlocal buffer, position, done
+        # Reads at least as much as is left, so that a record spanning many
+        # chunks isn't decoded again after each one.
+        chunk = "" if done else f.read(max(chunk_size, len(buffer) - position))
+        done = not chunk
+        # Forgets what was already read, so that the buffer stays small.
+        buffer, position = buffer[position:] + chunk, 0
+        return not done
+
+    def next_token() -> str:
+        """Skips whitespace, returns the next character ("" at the end)."""
+        while True:
+            advance(WHITESPACE.match(buffer, position).end())  # type: ignore[union-attr]
+            if position < len(buffer) or not fill():
+                return buffer[position : position + 1]
+
+    def fail(message: str) -> NoReturn:
+        raise CatalogueRecordError(path, line, message)
+
+    next_token()
+    advance(position + 1)  # "["
+    if next_token() == "]":
+        return
+    while True:
+        next_token()
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if fill():
+                    continue
+                fail(e.msg)
+            # A record at the very end of the buffer may go on in the next chunk.
+            if end < len(buffer) or not fill():
+                break
+        yield line, record
+        advance(end)
+        token = next_token()
+        advance(position + 1)
+        if token == "]":
+            return
+        if token != ",":
+            fail("Expecting ',' delimiter" if token else "Unterminated array")
+
+
+def load_records(
+    path: str,
+    build: Callable[[Any], T],
+    on_error: Callable[[CatalogueRecordError], object] = log_record_error,
+) -> Iterator[T]:
+    """Yields objects built from records of a JSON array or NDJSON file.
+
+    Records that can't be built (missing or invalid fields, unknown
+    ingredients...) are passed to `on_error` and skipped.
+
+    Args:
+    - build: builds an object from a record, raising `KeyError`, `TypeError`,
+      `ValueError`, `ZeroDivisionError` or `IngredientNotFound` if invalid.
+    - on_error: called with every skipped record, logs them by default.
+    """
+    with open(path) as f:
+        for line, record in iter_records(f, path):
+            if isinstance(record, CatalogueRecordError):
+                on_error(record)
+                continue
+            try:
+                built = build(record)
+            except IngredientNotFound:
+                on_error(CatalogueRecordError(path, line, "Unknown ingredient"))
+            except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+                message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+                on_error(CatalogueRecordError(path, line, message))
+            else:
+                yield built
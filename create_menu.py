@@ -1,19 +1,68 @@
-from dataclasses import dataclass
-from typing import TypeAlias, Protocol
-from itertools import combinations_with_replacement
+import heapq
+import math
+import operator
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from collections.abc import Callable, Iterator, Sequence
+from typing import TypeAlias, Protocol, cast
+from itertools import (
+    chain,
+    combinations_with_replacement,
+    groupby,
+    islice,
+    product,
+    repeat,
+)
+from multiprocessing.context import BaseContext
 from uuid import UUID, uuid4
 
-from create_recipes import Recipe, RecipeRepository
-from preferences import DietaryPreference, DietaryPreferenceDTO, create_preferences
+import numpy as np
+from scipy.spatial import KDTree  # type: ignore[import-untyped]
+
+from create_recipes import IngredientId, Recipe, RecipeId, RecipeRepository
+from preferences import (
+    AdditivePreference,
+    DietaryPreference,
+    DietaryPreferenceCombination,
+    DietaryPreferenceDTO,
+    KilocaloriesPreferences,
+    MacroPreferences,
+    RestrictIngredient,
+    create_preferences,
+    preference_lower_bound,
+    restricted_ingredients,
+)
 
 
 MenuId: TypeAlias = UUID
+MenuSolver: TypeAlias = Callable[
+    [list[Recipe], int, DietaryPreference | None], list[Recipe]
+]
 
 
 @dataclass
 class Menu:
+    """Holds a menu.
+
+    Properties:
+    - cost: how far meals are from the preferences the menu was created for.
+    - optimality_gap: how much lower the cost of the best possible menu could
+      be, 0 if the menu is known to be the best one.
+    - alternatives: next best menus, ranked.
+    """
+
     id: MenuId
     meals: list[Recipe]
+    cost: float | None = None
+    optimality_gap: float | None = None
+    alternatives: list["Menu"] = field(default_factory=list)
 
 
 def select_recipes_brute_force(
@@ -42,6 +91,1225 @@ def select_recipes_brute_force(
     )
 
 
+# Relative slack given to lower bounds, so that rounding errors never discard a
+# partial menu that would lead to the same result as brute force.
+BOUND_TOLERANCE = 1e-9
+
+
+def _can_prune(bound: float, best_cost: float) -> bool:
+    if bound == float("inf"):
+        return True
+    return bound - BOUND_TOLERANCE * max(1.0, abs(bound)) >= best_cost
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+@dataclass
+class SearchProgress:
+    """Where a search stands.
+
+    Properties:
+    - best_cost: cost of the best menu found so far, None if none yet.
+    - evaluated: number of (possibly partial) menus scored.
+    - pruned: number of partial menus discarded by their lower bound.
+    - elapsed: seconds since the search started.
+    """
+
+    best_cost: float | None
+    evaluated: int
+    pruned: int
+    elapsed: float
+
+
+class SearchMonitor:
+    """Watches the searches run within `monitored`, from their thread.
+
+    Searches call `checkpoint` every so often: it raises `SearchCancelled`
+    once `cancelled` is set, and passes progress to `on_progress` at most
+    every `interval` seconds. The brute force reference is not watched.
+    """
+
+    def __init__(
+        self,
+        cancelled: threading.Event | None = None,
+        on_progress: Callable[[SearchProgress], object] | None = None,
+        interval: float = 0.1,
+    ):
+        self.cancelled = cancelled
+        self.on_progress = on_progress
+        self.interval = interval
+        self.started = self.reported = time.monotonic()
+
+    def checkpoint(self, evaluated: int, pruned: int, best_cost: float | None):
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise SearchCancelled()
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            if best_cost is not None and not math.isfinite(best_cost):
+                best_cost = None
+            self.on_progress(
+                SearchProgress(best_cost, evaluated, pruned, now - self.started)
+            )
+
+
+_search_monitor: ContextVar[SearchMonitor | None] = ContextVar(
+    "_search_monitor", default=None
+)
+
+
+@contextmanager
+def monitored(monitor: SearchMonitor) -> Iterator[None]:
+    token = _search_monitor.set(monitor)
+    try:
+        yield
+    finally:
+        _search_monitor.reset(token)
+
+
+def _checkpoint(evaluated: int, pruned: int = 0, best_cost: float | None = None):
+    monitor = _search_monitor.get()
+    if monitor is not None:
+        monitor.checkpoint(evaluated, pruned, best_cost)
+
+
+class MenuScorer:
+    """Scores menus built by appending recipes one at a time.
+
+    Additive preferences (see `preferences.AdditivePreference`) are scored in
+    O(1) from running totals; any other preference falls back to being called
+    on the whole menu (and to `preferences.preference_lower_bound`). Costs are
+    the same, to the last bit, as calling `preferences` on the menu.
+
+    Menus are referred to by the index of their recipes in `recipes`, and
+    running totals start from `initial_totals()`.
+    """
+
+    def __init__(
+        self, recipes: Sequence[Recipe], size: int, preferences: DietaryPreference
+    ):
+        self.recipes = recipes
+        self.size = size
+        if isinstance(preferences, DietaryPreferenceCombination):
+            parts = list(preferences.preferences)
+        else:
+            parts = [preferences]
+        self.parts: list[tuple[DietaryPreference, slice | None]] = []
+        additive: list[AdditivePreference] = []
+        offset = 0
+        for part in parts:
+            if isinstance(part, AdditivePreference):
+                additive.append(part)
+                self.parts.append((part, slice(offset, offset + part.dimensions)))
+                offset += part.dimensions
+            else:
+                self.parts.append((part, None))
+        self.has_fallback = any(totals is None for _, totals in self.parts)
+        self.contributions = [
+            tuple(amount for p in additive for amount in p.contribution(recipe))
+            for recipe in recipes
+        ]
+        # Lowest and highest amounts any of `recipes[start:]` contributes.
+        self.suffix_lowest: list[tuple[float, ...]] = [()] * len(recipes)
+        self.suffix_highest: list[tuple[float, ...]] = [()] * len(recipes)
+        lowest = highest = tuple(float("nan") for _ in range(offset))
+        for start in reversed(range(len(recipes))):
+            contribution = self.contributions[start]
+            if start == len(recipes) - 1:
+                lowest = highest = contribution
+            else:
+                lowest = tuple(map(min, lowest, contribution))
+                highest = tuple(map(max, highest, contribution))
+            self.suffix_lowest[start] = lowest
+            self.suffix_highest[start] = highest
+
+    def initial_totals(self) -> tuple[float, ...]:
+        return (0.0,) * len(self.suffix_lowest[0]) if self.recipes else ()
+
+    def add(self, totals: tuple[float, ...], index: int) -> tuple[float, ...]:
+        return tuple(map(operator.add, totals, self.contributions[index]))
+
+    def replace(
+        self, totals: tuple[float, ...], old: int, new: int
+    ) -> tuple[float, ...]:
+        """Returns totals of the menu with `recipes[old]` swapped for `new`.
+
+        Rounding may differ from adding the menu's recipes up again.
+        """
+        return tuple(
+            total - removed + added
+            for total, removed, added in zip(
+                totals, self.contributions[old], self.contributions[new]
+            )
+        )
+
+    def cost(self, totals: tuple[float, ...], menu: Sequence[Recipe]) -> float:
+        cost: float = 0
+        for preference, amounts in self.parts:
+            if amounts is None:
+                cost += preference(menu)
+            else:
+                cost += cast(AdditivePreference, preference).finalize(totals[amounts])
+        return cost
+
+    def lower_bound(
+        self, totals: tuple[float, ...], menu: Sequence[Recipe], start: int
+    ) -> float:
+        """Lower bound for menus completing `menu` with `recipes[start:]`."""
+        remaining = self.size - len(menu)
+        candidates = self.recipes[start:] if self.has_fallback else ()
+        lower = [
+            total + remaining * amount
+            for total, amount in zip(totals, self.suffix_lowest[start])
+        ]
+        upper = [
+            total + remaining * amount
+            for total, amount in zip(totals, self.suffix_highest[start])
+        ]
+        bound: float = 0
+        for preference, amounts in self.parts:
+            if amounts is None:
+                bound += preference_lower_bound(preference, menu, candidates, self.size)
+            else:
+                bound += cast(AdditivePreference, preference).finalize_bound(
+                    lower[amounts], upper[amounts]
+                )
+        return bound
+
+
+def select_menus_branch_and_bound(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    count: int = 1,
+    including: Recipe | None = None,
+) -> list[tuple[float, list[Recipe]]]:
+    """Returns the `count` best lists of meals from preferences, with costs.
+
+    Same menus, in the same order, as sorting every combination
+    `select_recipes_brute_force` tests by cost (draws in test order) and
+    keeping the first `count`, without testing every combination: menus are
+    built one recipe at a time, in the order `combinations_with_replacement`
+    would test them, and a partial menu is discarded as soon as its lower
+    bound (see `preferences.BoundedPreference`) shows it cannot beat the
+    `count`-th best menu found so far. Preferences that provide no bound are
+    never pruned, so the search degrades to brute force for them.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - count: number of menus to return (fewer if there aren't as many).
+    - including: if given, only menus including this recipe are tested.
+    """
+    if size < 1 or len(recipes) == 0 or count < 1:
+        raise ValueError
+    if including is None:
+        required = None
+    elif including in recipes:
+        required = recipes.index(including)
+    else:
+        raise ValueError
+    scorer = MenuScorer(recipes, size, preferences or (lambda recipes: 0))
+    menu: list[Recipe] = []
+    # Max-heap of the best menus so far, keyed by (cost, test order).
+    best: list[tuple[float, int, list[Recipe]]] = []
+    tested = pruned = 0
+    best_cost = float("inf")
+
+    def keep(menu_cost: float):
+        nonlocal tested, best_cost
+        tested += 1
+        best_cost = min(best_cost, menu_cost)
+        if len(best) < count:
+            heapq.heappush(best, (-menu_cost, -tested, list(menu)))
+        elif menu_cost < -best[0][0]:
+            heapq.heapreplace(best, (-menu_cost, -tested, list(menu)))
+
+    def search(start: int, totals: tuple[float, ...], missing: bool):
+        nonlocal pruned
+        # Recipes are picked in order: past the required one, it can't be.
+        stop = cast(int, required) + 1 if missing else len(recipes)
+        if len(menu) == size - 1:
+            for i in range(stop - 1 if missing else start, stop):
+                menu.append(recipes[i])
+                keep(scorer.cost(scorer.add(totals, i), tuple(menu)))
+                menu.pop()
+            return
+        _checkpoint(tested, pruned, best_cost)
+        if len(best) == count and _can_prune(
+            scorer.lower_bound(totals, menu, start), -best[0][0]
+        ):
+            pruned += 1
+            return
+        for i in range(start, stop):
+            menu.append(recipes[i])
+            search(i, scorer.add(totals, i), missing and i != required)
+            menu.pop()
+
+    search(0, scorer.initial_totals(), required is not None)
+    return [(-cost, meals) for cost, _, meals in sorted(best, reverse=True)]
+
+
+def select_recipes_branch_and_bound(
+    recipes: list[Recipe], size: int, preferences: DietaryPreference | None = None
+) -> list[Recipe]:
+    """Returns list of meals from preferences.
+
+    Same result as `select_recipes_brute_force`, draws included, see
+    `select_menus_branch_and_bound`.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    """
+    [(_, meals)] = select_menus_branch_and_bound(recipes, size, preferences)
+    return meals
+
+
+def _depends_on_nutrition_and_ingredients(preferences: DietaryPreference) -> bool:
+    if isinstance(preferences, DietaryPreferenceCombination):
+        return all(
+            _depends_on_nutrition_and_ingredients(p) for p in preferences.preferences
+        )
+    return isinstance(
+        preferences, (RestrictIngredient, MacroPreferences, KilocaloriesPreferences)
+    )
+
+
+def _equivalent_recipe_groups(recipes: list[Recipe]) -> list[list[int]]:
+    """Returns indices of identical recipes, grouped in order of appearance."""
+    groups: dict[tuple[frozenset[IngredientId], tuple[float, ...]], list[int]] = {}
+    for index, recipe in enumerate(recipes):
+        key = (
+            frozenset(i.id for _, i in recipe.ingredients),
+            (*recipe.macros_per_serving(), recipe.kilocalories_per_serving()),
+        )
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
+
+def equivalent_recipe_representatives(
+    recipes: list[Recipe], epsilon: float = 0.0
+) -> list[Recipe]:
+    """Returns one recipe of each group of nutritionally identical recipes.
+
+    Recipes are grouped if they call for the same set of ingredients and their
+    per-serving nutrition (macros and kilocalories) differ by at most
+    `epsilon`. The first recipe of each group represents it, in order of
+    appearance.
+    """
+    if epsilon == 0:
+        return [recipes[group[0]] for group in _equivalent_recipe_groups(recipes)]
+    representatives: list[Recipe] = []
+    groups: dict[frozenset[IngredientId], list[tuple[float, ...]]] = {}
+    for recipe in recipes:
+        ingredients = frozenset(i.id for _, i in recipe.ingredients)
+        nutrition = (*recipe.macros_per_serving(), recipe.kilocalories_per_serving())
+        group = groups.setdefault(ingredients, [])
+        if not any(
+            all(abs(a - b) <= epsilon for a, b in zip(nutrition, other))
+            for other in group
+        ):
+            group.append(nutrition)
+            representatives.append(recipe)
+    return representatives
+
+
+def select_recipes_collapsed(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    select_recipes: MenuSolver = select_recipes_branch_and_bound,
+    epsilon: float = 0.0,
+) -> list[Recipe]:
+    """Returns list of meals from preferences.
+
+    Searches with `select_recipes` over `equivalent_recipe_representatives`
+    only: nutritionally identical recipes cost the same in any menu, so the
+    menu found is made of the first recipe of each group, which is the one
+    the tie-break of `select_recipes_brute_force` would pick anyway. With
+    `epsilon` > 0, menus may cost up to `epsilon` per meal and nutrient more
+    than the best one.
+
+    Only done if preferences just depend on nutrition and ingredients (macro,
+    kilocalories and restricted ingredients); `select_recipes` is given every
+    recipe otherwise.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - select_recipes: solver used on the collapsed recipes.
+    - epsilon: largest per-serving nutrition difference within a group.
+    """
+    if preferences is None or _depends_on_nutrition_and_ingredients(preferences):
+        recipes = equivalent_recipe_representatives(recipes, epsilon)
+    return select_recipes(recipes, size, preferences)
+
+
+def select_menus_collapsed(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    count: int = 1,
+    groups: list[list[int]] | None = None,
+) -> list[tuple[float, list[Recipe]]]:
+    """Returns the `count` best lists of meals from preferences, with costs.
+
+    Same menus, in the same order, as `select_menus_branch_and_bound`, but
+    only `equivalent_recipe_representatives` are searched if preferences just
+    depend on nutrition and ingredients. Each menu found stands for the menus
+    swapping its meals for identical recipes, at the same cost, which are
+    ranked in test order. Only the first `count` recipes of each group are
+    swapped in: a menu using a later one is beaten by `count` menus using
+    earlier ones instead.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - count: number of menus to return (fewer if there aren't as many).
+    - groups: indices of identical `recipes`, as `_equivalent_recipe_groups`
+      returns them, if already known. Recipes of no group are left out.
+    """
+    if preferences is not None and not _depends_on_nutrition_and_ingredients(
+        preferences
+    ):
+        return select_menus_branch_and_bound(recipes, size, preferences, count)
+    if groups is None:
+        groups = _equivalent_recipe_groups(recipes)
+    group_of = {recipes[group[0]].id: i for i, group in enumerate(groups)}
+    ranked: list[tuple[float, list[int]]] = []
+    for cost, meals in select_menus_branch_and_bound(
+        [recipes[group[0]] for group in groups], size, preferences, count
+    ):
+        # Meals come in recipe order, so those of a group are next to each other.
+        picks = [
+            combinations_with_replacement(groups[i][:count], len(list(same)))
+            for i, same in groupby(group_of[meal.id] for meal in meals)
+        ]
+        ranked += [(cost, sorted(chain(*picked))) for picked in product(*picks)]
+    ranked.sort()
+    return [(cost, [recipes[i] for i in menu]) for cost, menu in ranked[:count]]
+
+
+# Candidates scored at once by `select_recipes_vectorized`. Peak memory is
+# roughly `chunk_size * (size + 5) * 8` bytes.
+DEFAULT_CHUNK_SIZE = 2**16
+
+
+def menu_lower_bound(
+    recipes: list[Recipe], size: int, preferences: DietaryPreference | None = None
+) -> float:
+    """Returns a lower bound for the cost of any menu made of `recipes`."""
+    if size < 1 or len(recipes) == 0:
+        raise ValueError
+    scorer = MenuScorer(recipes, size, preferences or (lambda recipes: 0))
+    return scorer.lower_bound(scorer.initial_totals(), [], 0)
+
+
+# Iterations run by `select_recipes_local_search` when no time limit is given.
+DEFAULT_LOCAL_SEARCH_ITERATIONS = 20_000
+
+
+def select_recipes_local_search(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    time_limit: float | None = None,
+    seed: int | None = None,
+) -> list[Recipe]:
+    """Returns list of meals from preferences.
+
+    Anytime heuristic: starts from a greedy menu (each meal being the recipe
+    with the lowest `MenuScorer.lower_bound`) and improves it by simulated
+    annealing, replacing one meal at a time, until `time_limit` seconds have
+    passed (or `DEFAULT_LOCAL_SEARCH_ITERATIONS` without a time limit). The
+    best menu found is returned, which may not be the best possible one.
+    Stops early if it reaches `menu_lower_bound`. If `time_limit` runs out
+    while building the greedy menu, its remaining meals repeat the best
+    recipe of the last one picked.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - time_limit: seconds given to the search.
+    - seed: seed of the random moves, for reproducible menus.
+    """
+    if size < 1 or len(recipes) == 0:
+        raise ValueError
+    started = time.monotonic()
+    rng = random.Random(seed)
+    scorer = MenuScorer(recipes, size, preferences or (lambda recipes: 0))
+    bound = scorer.lower_bound(scorer.initial_totals(), [], 0)
+
+    deadline = None if time_limit is None else started + time_limit
+    menu: list[int] = []
+    meals: list[Recipe] = []
+    totals = scorer.initial_totals()
+    index = evaluated = 0
+    while len(menu) < size:
+        if menu and deadline is not None and time.monotonic() > deadline:
+            break
+        index, index_bound = 0, math.inf
+        for i in range(len(recipes)):
+            if i % 64 == 63:
+                _checkpoint(evaluated)
+                # Past the deadline, the meal is the best recipe seen so far.
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+            evaluated += 1
+            meals.append(recipes[i])
+            i_bound = scorer.lower_bound(scorer.add(totals, i), meals, 0)
+            meals.pop()
+            if i_bound < index_bound:
+                index, index_bound = i, i_bound
+        menu.append(index)
+        meals.append(recipes[index])
+        totals = scorer.add(totals, index)
+    for _ in range(size - len(menu)):
+        menu.append(index)
+        meals.append(recipes[index])
+        totals = scorer.add(totals, index)
+    cost = scorer.cost(totals, meals)
+    best_menu, best_cost = list(menu), cost
+
+    temperature = max(1.0, cost / 10) if math.isfinite(cost) else 1.0
+    iteration = 0
+    while best_cost > bound:
+        if iteration % 64 == 0:
+            _checkpoint(iteration, best_cost=best_cost)
+        if time_limit is None:
+            progress = iteration / DEFAULT_LOCAL_SEARCH_ITERATIONS
+        elif time_limit <= 0:
+            break
+        elif iteration % 64 == 0:
+            progress = (time.monotonic() - started) / time_limit
+        if progress >= 1:
+            break
+        iteration += 1
+        position, index = rng.randrange(size), rng.randrange(len(recipes))
+        previous = menu[position]
+        menu[position] = index
+        candidate_totals = scorer.replace(totals, previous, index)
+        # Only preferences that aren't additive look at the meals.
+        if scorer.has_fallback:
+            meals = [recipes[i] for i in menu]
+        candidate_cost = scorer.cost(candidate_totals, meals)
+        if candidate_cost <= cost or (
+            math.isfinite(candidate_cost)
+            and rng.random()
+            < math.exp((cost - candidate_cost) / (temperature * (1 - progress)))
+        ):
+            totals, cost = candidate_totals, candidate_cost
+            if cost < best_cost:
+                best_menu, best_cost = list(menu), cost
+        else:
+            menu[position] = previous
+    return [recipes[i] for i in sorted(best_menu)]
+
+
+class VectorizedScorer:
+    """Scores chunks of menus, given as rows of recipe indices, with NumPy.
+
+    Per-serving (carbohydrates, proteins, fats, kilocalories) of every recipe
+    are packed once into a matrix. `MacroPreferences`,
+    `KilocaloriesPreferences` and `RestrictIngredient` are then scored with
+    array operations, performed in the same order as calling them, so costs
+    are the same to the last bit. Any other preference falls back to being
+    called on each menu.
+    """
+
+    def __init__(self, recipes: Sequence[Recipe], preferences: DietaryPreference):
+        self.recipes = recipes
+        self.nutrition = np.array(
+            [
+                (*recipe.macros_per_serving(), recipe.kilocalories_per_serving())
+                for recipe in recipes
+            ],
+            dtype=np.float64,
+        ).reshape(len(recipes), 4)
+        if isinstance(preferences, DietaryPreferenceCombination):
+            self.parts = list(preferences.preferences)
+        else:
+            self.parts = [preferences]
+        self.forbidden = {
+            i: np.array([recipe.contains(part.ingredient_id) for recipe in recipes])
+            for i, part in enumerate(self.parts)
+            if isinstance(part, RestrictIngredient)
+        }
+
+    def __call__(self, menus: np.ndarray) -> np.ndarray:
+        totals = self.nutrition[menus[:, 0]]
+        for column in range(1, menus.shape[1]):
+            totals = totals + self.nutrition[menus[:, column]]
+        costs = np.zeros(len(menus))
+        for i, part in enumerate(self.parts):
+            if isinstance(part, MacroPreferences):
+                costs = costs + (
+                    np.abs(part.carbohydrates - totals[:, 0])
+                    + np.abs(part.proteins - totals[:, 1])
+                    + np.abs(part.fats - totals[:, 2])
+                )
+            elif isinstance(part, KilocaloriesPreferences):
+                costs = costs + np.abs(part.kilocalories - totals[:, 3])
+            elif isinstance(part, RestrictIngredient):
+                forbidden = self.forbidden[i][menus].any(axis=1)
+                costs = costs + np.where(forbidden, float("inf"), 0.0)
+            else:
+                costs = costs + np.fromiter(
+                    (part(tuple(self.recipes[j] for j in menu)) for menu in menus),
+                    dtype=np.float64,
+                    count=len(menus),
+                )
+        return costs
+
+
+def _best_candidate(
+    scorer: VectorizedScorer,
+    candidates: Iterator[tuple[int, ...]],
+    size: int,
+    chunk_size: int,
+) -> tuple[float, tuple[int, ...]] | None:
+    """Returns cost and recipe indices of the first best of `candidates`."""
+    best: tuple[float, tuple[int, ...]] | None = None
+    evaluated = 0
+    while True:
+        menus = np.fromiter(
+            chain.from_iterable(islice(candidates, chunk_size)), dtype=np.intp
+        ).reshape(-1, size)
+        if len(menus) == 0:
+            return best
+        _checkpoint(evaluated, best_cost=None if best is None else best[0])
+        evaluated += len(menus)
+        costs = scorer(menus)
+        # `argmin` returns the first of the draws.
+        i = int(np.argmin(costs))
+        if best is None or costs[i] < best[0]:
+            best = float(costs[i]), tuple(int(j) for j in menus[i])
+
+
+def select_recipes_vectorized(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> list[Recipe]:
+    """Returns list of meals from preferences.
+
+    Same result as `select_recipes_brute_force`, draws included, but
+    candidates are scored `chunk_size` at a time with `VectorizedScorer`
+    instead of one Python call per candidate.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - chunk_size: number of candidates scored at once, bounds peak memory.
+    """
+    if size < 1 or len(recipes) == 0 or chunk_size < 1:
+        raise ValueError
+    scorer = VectorizedScorer(recipes, preferences or (lambda recipes: 0))
+    candidates = combinations_with_replacement(range(len(recipes)), size)
+    best = _best_candidate(scorer, candidates, size, chunk_size)
+    assert best is not None
+    return [recipes[i] for i in best[1]]
+
+
+# Set once per worker process by `_init_parallel_worker`.
+_parallel_scorer: VectorizedScorer | None = None
+
+
+def _init_parallel_worker(
+    recipes: list[Recipe], preferences: DietaryPreference | None
+) -> None:
+    global _parallel_scorer
+    _parallel_scorer = VectorizedScorer(recipes, preferences or (lambda recipes: 0))
+
+
+def _best_candidate_with_prefix(
+    prefix: tuple[int, ...], size: int, chunk_size: int
+) -> tuple[float, tuple[int, ...]] | None:
+    assert _parallel_scorer is not None
+    suffixes = combinations_with_replacement(
+        range(prefix[-1], len(_parallel_scorer.recipes)), size - len(prefix)
+    )
+    candidates = (prefix + suffix for suffix in suffixes)
+    return _best_candidate(_parallel_scorer, candidates, size, chunk_size)
+
+
+def select_recipes_parallel(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    max_workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mp_context: BaseContext | None = None,
+) -> list[Recipe]:
+    """Returns list of meals from preferences.
+
+    Same result as `select_recipes_brute_force`, draws included, testing all
+    combinations across a pool of processes. Combinations are split by their
+    first recipes (prefixes, enough of them to keep every worker busy); each
+    worker scores the combinations of a prefix with `VectorizedScorer`, and
+    the best of each prefix are compared in the order they would be tested.
+
+    Recipes and preferences are handed to each worker once, when it starts
+    (inherited rather than pickled where processes are forked), so
+    preferences must be picklable on platforms spawning processes.
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - max_workers: number of processes, defaults to the number of CPUs.
+    - chunk_size: number of candidates scored at once by each worker.
+    - mp_context: how processes are started, the platform's default way if
+      None.
+    """
+    if size < 1 or len(recipes) == 0 or chunk_size < 1:
+        raise ValueError
+    max_workers = max_workers or os.cpu_count() or 1
+    prefix_size = 1
+    while (
+        prefix_size < size
+        and math.comb(len(recipes) + prefix_size - 1, prefix_size) < 4 * max_workers
+    ):
+        prefix_size += 1
+    prefixes = list(combinations_with_replacement(range(len(recipes)), prefix_size))
+    best: tuple[float, tuple[int, ...]] | None = None
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_parallel_worker,
+        initargs=(recipes, preferences),
+        mp_context=mp_context,
+    ) as executor:
+        results = executor.map(
+            _best_candidate_with_prefix,
+            prefixes,
+            repeat(size),
+            repeat(chunk_size),
+            chunksize=max(1, len(prefixes) // (4 * max_workers)),
+        )
+        evaluated = 0
+        try:
+            for prefix, result in zip(prefixes, results):
+                _checkpoint(evaluated, best_cost=None if best is None else best[0])
+                suffix_size = size - prefix_size
+                evaluated += math.comb(
+                    len(recipes) - prefix[-1] + suffix_size - 1, suffix_size
+                )
+                if result is not None and (best is None or result[0] < best[0]):
+                    best = result
+        except SearchCancelled:
+            executor.shutdown(cancel_futures=True)
+            raise
+    assert best is not None
+    return [recipes[i] for i in best[1]]
+
+
+class MenuSumIndex:
+    """Summed nutrition of every menu of up to `max_size` meals.
+
+    Answers best menu queries for preferences `nearest_target_columns`
+    understands with a nearest neighbour lookup in a k-d tree (one per menu
+    size and set of targeted nutrients, built on first use) instead of a
+    search. Restricted ingredients are filtered out of the nearest menus.
+
+    Adding a recipe only computes the menus including it, which are kept
+    apart and looked up by brute force until they outgrow `rebuild_ratio`
+    of the indexed ones; trees are rebuilt then.
+
+    Properties:
+    - version: catalogue version the index reflects, if known. Recipe
+      repositories bump it once per added recipe, and so does `add`; recipes
+      added elsewhere (by another worker sharing the database) are caught up
+      with by `refresh`.
+    """
+
+    def __init__(
+        self,
+        recipes: list[Recipe],
+        max_size: int = 3,
+        rebuild_ratio: float = 0.1,
+        version: int | None = None,
+    ):
+        self.max_size = max_size
+        self.rebuild_ratio = rebuild_ratio
+        self.version = version
+        self.recipes: list[Recipe] = []
+        self.positions: dict[RecipeId, int] = {}
+        self.nutrition = np.empty((0, 4))
+        # Per menu size, recipe indices and summed nutrition of menus (indexed
+        # ones first, then pending ones) and how many are indexed.
+        self.menus: dict[int, np.ndarray] = {}
+        self.sums: dict[int, np.ndarray] = {}
+        self.indexed: dict[int, int] = {}
+        self.trees: dict[tuple[int, tuple[int, ...]], KDTree] = {}
+        self.lock = threading.Lock()
+        self._rebuild(recipes)
+
+    @property
+    def sizes(self) -> range:
+        return range(1, self.max_size + 1)
+
+    def add(self, recipe: Recipe):
+        with self.lock:
+            if self.version is not None:
+                self.version += 1
+            if recipe.id in self.positions:
+                recipes = list(self.recipes)
+                recipes[self.positions[recipe.id]] = recipe
+                self._rebuild(recipes)
+                return
+            self._append(recipe)
+            for size in self.sizes:
+                pending = len(self.menus[size]) - self.indexed[size]
+                if pending > self.rebuild_ratio * self.indexed[size]:
+                    self.indexed[size] = len(self.menus[size])
+                    self.trees = {k: t for k, t in self.trees.items() if k[0] != size}
+
+    def refresh(self, version: int, recipes: list[Recipe]):
+        """Rebuilds the index from `recipes`, of catalogue `version`, unless it
+        already reflects that version."""
+        with self.lock:
+            if self.version != version:
+                self._rebuild(recipes)
+                self.version = version
+
+    def memory_footprint(self) -> int:
+        """Returns approximate number of bytes held by the index."""
+        arrays: list[np.ndarray] = [
+            self.nutrition,
+            *self.menus.values(),
+            *self.sums.values(),
+        ]
+        footprint = sum(a.nbytes for a in arrays)
+        for tree in self.trees.values():
+            footprint += tree.data.nbytes + tree.indices.nbytes
+        return footprint
+
+    def nearest(
+        self, size: int, preferences: DietaryPreference | None
+    ) -> list[Recipe] | None:
+        """Returns the best menu of `size` meals for `preferences`.
+
+        Returns None if the index can't tell: menus of `size` aren't indexed,
+        preferences aren't understood or don't target any nutrient, or every
+        menu is forbidden. Draws are broken like brute force does: the menu
+        returned comes first in `combinations_with_replacement` order.
+        """
+        split = nearest_target_columns(preferences)
+        if size not in self.sizes or split is None or not split[0]:
+            return None
+        columns, targets, restricted = split
+        with self.lock:
+            allowed = np.array(
+                [
+                    not any(recipe.contains(i) for i in restricted)
+                    for recipe in self.recipes
+                ],
+                dtype=bool,
+            )
+            target = np.array(targets, dtype=np.float64)
+            menus, sums = self.menus[size], self.sums[size][:, columns]
+            indexed = self.indexed[size]
+            rows = np.arange(indexed, len(menus))
+            if indexed:
+                tree = self._tree(size, columns)
+                k = 1
+                while True:
+                    distances, nearest = tree.query(target, k=k, p=1)
+                    distances, nearest = np.atleast_1d(distances, nearest)
+                    found = allowed[menus[nearest]].all(axis=1)
+                    if found.any() or k >= indexed:
+                        break
+                    k = min(4 * k, indexed)
+                if found.any():
+                    # Menus as near as the nearest allowed one, for draws.
+                    radius = float(distances[int(np.argmax(found))])
+                    near = tree.query_ball_point(target, radius * (1 + 1e-9), p=1)
+                    rows = np.concatenate([np.asarray(near, dtype=rows.dtype), rows])
+            rows = rows[allowed[menus[rows]].all(axis=1)]
+            if len(rows) == 0:
+                return None
+            distances = np.abs(sums[rows] - target).sum(axis=1)
+            rows = rows[distances == distances.min()]
+            best = min(rows, key=lambda row: tuple(menus[row]))
+            return [self.recipes[i] for i in menus[best]]
+
+    def _tree(self, size: int, columns: list[int]) -> KDTree:
+        key = (size, tuple(columns))
+        if key not in self.trees:
+            self.trees[key] = KDTree(self.sums[size][: self.indexed[size], columns])
+        return self.trees[key]
+
+    def _rebuild(self, recipes: list[Recipe]):
+        self.recipes = list(recipes)
+        self.positions = {recipe.id: i for i, recipe in enumerate(recipes)}
+        self.nutrition = VectorizedScorer(
+            recipes, DietaryPreferenceCombination([])
+        ).nutrition
+        self.trees = {}
+        for size in self.sizes:
+            menus = np.fromiter(
+                chain.from_iterable(
+                    combinations_with_replacement(range(len(recipes)), size)
+                ),
+                dtype=np.int32,
+            ).reshape(-1, size)
+            self.menus[size] = menus
+            self.sums[size] = self._sum(menus)
+        self.indexed = {size: len(self.menus[size]) for size in self.sizes}
+
+    def _append(self, recipe: Recipe):
+        """Appends `recipe` and the menus including it as pending."""
+        new = len(self.recipes)
+        self.recipes.append(recipe)
+        self.positions[recipe.id] = new
+        self.nutrition = np.vstack(
+            [
+                self.nutrition,
+                [*recipe.macros_per_serving(), recipe.kilocalories_per_serving()],
+            ]
+        )
+        for size in self.sizes:
+            # Menus including the new recipe: any smaller menu plus it.
+            menus = np.fromiter(
+                chain.from_iterable(
+                    (*others, new)
+                    for others in combinations_with_replacement(
+                        range(new + 1), size - 1
+                    )
+                ),
+                dtype=np.int32,
+            ).reshape(-1, size)
+            self.menus[size] = np.concatenate([self.menus[size], menus])
+            self.sums[size] = np.concatenate([self.sums[size], self._sum(menus)])
+
+    def _sum(self, menus: np.ndarray) -> np.ndarray:
+        totals = self.nutrition[menus[:, 0]]
+        for column in range(1, menus.shape[1]):
+            totals += self.nutrition[menus[:, column]]
+        return totals
+
+
+MenuRequestKey: TypeAlias = tuple[int, int, tuple[tuple[str, str], ...]]
+
+
+def menu_request_key(
+    size: int, preferences_spec: list[DietaryPreferenceDTO], alternatives: int = 0
+) -> MenuRequestKey:
+    """Returns the same key for menu requests leading to the same menus.
+
+    Preferences are compared regardless of their order.
+    """
+    preferences = sorted(
+        (p.type_, repr(sorted(p.parameters.items()))) for p in preferences_spec
+    )
+    return (size, alternatives, tuple(preferences))
+
+
+@dataclass
+class MenuCacheEntry:
+    """Menus found for a request, best first, for given catalogue version.
+
+    Preferences are kept, if given, so that menus can be brought up to date
+    when the catalogue changes instead of being searched again.
+    """
+
+    version: int
+    menus: list[Menu]
+    created: float
+    preferences: DietaryPreference | None = None
+
+
+class MenuCache:
+    """Least recently used cache of menus, keyed by `menu_request_key`.
+
+    Entries expire after `ttl` seconds, or as soon as the catalogue version
+    they were found for is not the current one anymore.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[MenuRequestKey, MenuCacheEntry] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: MenuRequestKey, version: int) -> list[Menu] | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or self.clock() - entry.created > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry.menus
+
+    def put(
+        self,
+        key: MenuRequestKey,
+        version: int,
+        menus: list[Menu],
+        preferences: DietaryPreference | None = None,
+    ):
+        with self.lock:
+            self.entries[key] = MenuCacheEntry(
+                version, menus, self.clock(), preferences
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def entries_for(self, version: int) -> list[tuple[MenuRequestKey, MenuCacheEntry]]:
+        """Returns entries found for catalogue `version`, expired or not."""
+        with self.lock:
+            return [(k, e) for k, e in self.entries.items() if e.version == version]
+
+    def update(
+        self, key: MenuRequestKey, previous: int, version: int, menus: list[Menu]
+    ):
+        """Replaces menus of entry `key` if still found for version `previous`.
+
+        The entry keeps its age and its place in the least recently used order.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.version == previous:
+                entry.version = version
+                entry.menus = menus
+
+
+def nearest_target_columns(
+    preferences: DietaryPreference | None,
+) -> tuple[list[int], list[float], list[IngredientId]] | None:
+    """Splits preferences into an L1 distance and restricted ingredients.
+
+    Returns the nutrition columns (carbohydrates, proteins, fats,
+    kilocalories, numbered as in `VectorizedScorer.nutrition`) and targets the
+    cost is the L1 distance over, plus restricted ingredients. None if
+    preferences can't be expressed that way (e.g. two macro preferences).
+    """
+    if preferences is None:
+        parts: list[DietaryPreference] = []
+    elif isinstance(preferences, DietaryPreferenceCombination):
+        parts = list(preferences.preferences)
+    else:
+        parts = [preferences]
+    columns: list[int] = []
+    targets: list[float] = []
+    restricted: list[IngredientId] = []
+    for part in parts:
+        if isinstance(part, RestrictIngredient):
+            restricted.append(part.ingredient_id)
+        elif isinstance(part, MacroPreferences) and 0 not in columns:
+            columns += [0, 1, 2]
+            targets += [part.carbohydrates, part.proteins, part.fats]
+        elif isinstance(part, KilocaloriesPreferences) and 3 not in columns:
+            columns.append(3)
+            targets.append(part.kilocalories)
+        else:
+            return None
+    return columns, targets, restricted
+
+
+def select_recipes_meet_in_the_middle(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> list[Recipe]:
+    """Returns list of meals from preferences.
+
+    Splits menus in two halves of `size // 2` and `size - size // 2` meals.
+    Summed nutrition of every combination of the first half is indexed in a
+    k-d tree; then, for each combination of the second half (streamed
+    `chunk_size` at a time), the tree returns the first half whose sum is
+    closest to what is left to reach the targets. That's two enumerations of
+    half menus instead of one of whole menus.
+
+    Returns a menu as good as `select_recipes_brute_force`'s, but in case
+    there's a draw any of the optimal menus may be returned. Meals are sorted
+    by their position in `recipes`. Falls back to
+    `select_recipes_branch_and_bound` unless preferences are restricted
+    ingredients plus at most one macro and one kilocalories preference (see
+    `nearest_target_columns`).
+
+    Args:
+    - recipes: List of possible recipes.
+    - preferences: Returned list of meals should satisfy this preferences.
+    - size: number of meals the menu should return.
+    - chunk_size: number of second halves looked up at once.
+    """
+    if size < 1 or len(recipes) == 0 or chunk_size < 1:
+        raise ValueError
+    split = nearest_target_columns(preferences)
+    if split is None:
+        return select_recipes_branch_and_bound(recipes, size, preferences)
+    columns, targets, restricted = split
+    allowed = [
+        i
+        for i, recipe in enumerate(recipes)
+        if not any(recipe.contains(ingredient) for ingredient in restricted)
+    ]
+    if not allowed:
+        raise ValueError
+    if not columns or size == 1:
+        # A single half: this is just a vectorized search.
+        candidates = [recipes[i] for i in allowed]
+        return select_recipes_vectorized(candidates, size, preferences, chunk_size)
+
+    nutrition = VectorizedScorer(
+        [recipes[i] for i in allowed], lambda recipes: 0
+    ).nutrition[:, columns]
+    target = np.array(targets, dtype=np.float64)
+
+    first_halves = np.fromiter(
+        chain.from_iterable(
+            combinations_with_replacement(range(len(allowed)), size // 2)
+        ),
+        dtype=np.intp,
+    ).reshape(-1, size // 2)
+    tree = KDTree(nutrition[first_halves].sum(axis=1))
+
+    second_halves = combinations_with_replacement(range(len(allowed)), size - size // 2)
+    best: tuple[float, np.ndarray] | None = None
+    # Second halves matched so far.
+    evaluated = 0
+    while True:
+        menus = np.fromiter(
+            chain.from_iterable(islice(second_halves, chunk_size)), dtype=np.intp
+        ).reshape(-1, size - size // 2)
+        if len(menus) == 0:
+            break
+        _checkpoint(evaluated, best_cost=None if best is None else best[0])
+        evaluated += len(menus)
+        # Only halves closer than the best menu so far are of interest,
+        # which lets the tree skip most of its branches.
+        distances, nearest = tree.query(
+            target - nutrition[menus].sum(axis=1),
+            p=1,
+            distance_upper_bound=np.inf if best is None else best[0],
+            workers=-1,
+        )
+        i = int(np.argmin(distances))
+        if np.isfinite(distances[i]) and (best is None or distances[i] < best[0]):
+            best = (
+                float(distances[i]),
+                np.concatenate([first_halves[nearest[i]], menus[i]]),
+            )
+    assert best is not None
+    return [recipes[allowed[i]] for i in sorted(best[1])]
+
+
+# Rough single core throughputs, used to estimate how long searches take.
+VECTORIZED_MENUS_PER_SECOND = 3e6
+# Without any pruning, the worst case.
+BRANCH_AND_BOUND_MENUS_PER_SECOND = 5e5
+MEET_IN_THE_MIDDLE_HALVES_PER_SECOND = 1e6
+GREEDY_STEPS_PER_SECOND = 2e5
+
+# Searches `estimate_menu_search` routes menu requests to, by name. Menu
+# requests are already solved concurrently by the app's solver threads, so
+# `select_recipes_parallel` isn't one: its processes would compete for the
+# same CPUs, and be started again for every request.
+MENU_ENGINES: dict[str, MenuSolver] = {
+    "vectorized": select_recipes_vectorized,
+    "branch-and-bound": select_recipes_collapsed,
+    "meet-in-the-middle": select_recipes_meet_in_the_middle,
+}
+# Anytime heuristic, run when no exact engine fits the budget.
+HEURISTIC_ENGINE = "local-search"
+
+
+@dataclass
+class MenuEstimate:
+    """Expected cost of searching the best menu.
+
+    Properties:
+    - candidates: number of menus an exhaustive search tests,
+      C(n + size - 1, size) for n recipes.
+    - seconds: estimated search time by engine name (see `MENU_ENGINES`),
+      worst case, for engines able to handle the preferences. The heuristic
+      engine runs as long as it is given, its estimate is for a first menu.
+    - engine: the exact engine estimated fastest if within budget, else the
+      heuristic engine if within budget, else None.
+    """
+
+    candidates: int
+    seconds: dict[str, float]
+    engine: str | None
+
+
+def _seconds(count: int, per_second: float) -> float:
+    try:
+        return count / per_second
+    except OverflowError:
+        return float("inf")
+
+
+def estimate_menu_search(
+    recipes: list[Recipe],
+    size: int,
+    preferences: DietaryPreference | None = None,
+    budget: float = float("inf"),
+    count: int = 1,
+) -> MenuEstimate:
+    """Estimates searching the best menu, and the engine to search it with.
+
+    Recipes forbidden by `preferences` should be removed beforehand, as
+    every engine would. Estimates are orders of magnitude, meant to tell
+    whether a search fits `budget` seconds. For the `count` best menus, only
+    `select_menus_collapsed` is considered.
+    """
+    if size < 1 or len(recipes) == 0:
+        raise ValueError
+    candidates = math.comb(len(recipes) + size - 1, size)
+    representatives = recipes
+    if preferences is None or _depends_on_nutrition_and_ingredients(preferences):
+        representatives = equivalent_recipe_representatives(recipes)
+    collapsed = _seconds(
+        math.comb(len(representatives) + size - 1, size),
+        BRANCH_AND_BOUND_MENUS_PER_SECOND,
+    )
+    if count > 1:
+        engine = "branch-and-bound" if collapsed <= budget else None
+        return MenuEstimate(candidates, {"branch-and-bound": collapsed}, engine)
+    seconds: dict[str, float] = {
+        "vectorized": _seconds(candidates, VECTORIZED_MENUS_PER_SECOND),
+        "branch-and-bound": collapsed,
+    }
+    split = nearest_target_columns(preferences)
+    if split is not None and split[0] and size > 1:
+        halves = math.comb(len(recipes) + size // 2 - 1, size // 2) + math.comb(
+            len(recipes) + size - size // 2 - 1, size - size // 2
+        )
+        seconds["meet-in-the-middle"] = _seconds(
+            halves, MEET_IN_THE_MIDDLE_HALVES_PER_SECOND
+        )
+    seconds[HEURISTIC_ENGINE] = _seconds(size * len(recipes), GREEDY_STEPS_PER_SECOND)
+    exact = [name for name in MENU_ENGINES if name in seconds]
+    engine = min(exact, key=lambda name: seconds[name])
+    if seconds[engine] > budget:
+        engine = HEURISTIC_ENGINE if seconds[HEURISTIC_ENGINE] <= budget else None
+    return MenuEstimate(candidates, seconds, engine)
+
+
 class MenuRepository(Protocol):
     def find(self, menu_id: MenuId) -> Menu | None: ...
 
@@ -60,6 +1328,12 @@ class CannotCreateMenu(Exception):
     pass
 
 
+class MenuSearchTooExpensive(Exception):
+    def __init__(self, estimate: MenuEstimate):
+        super().__init__()
+        self.estimate = estimate
+
+
 class GetMenuUseCase:
     def __init__(self, menu_repository: MenuRepository):
         self.menu_repository = menu_repository
@@ -71,23 +1345,403 @@ class GetMenuUseCase:
         return menu
 
 
+@dataclass
+class MenuRequestDTO:
+    size: int
+    preferences: list[DietaryPreferenceDTO]
+    deadline_ms: int | None = None
+    alternatives: int = 0
+
+
 class CreateMenuUseCase:
     def __init__(
-        self, recipe_repository: RecipeRepository, menu_repository: MenuRepository
+        self,
+        recipe_repository: RecipeRepository,
+        menu_repository: MenuRepository,
+        select_recipes: MenuSolver = select_recipes_collapsed,
+        cache: MenuCache | None = None,
+        sum_index: MenuSumIndex | None = None,
+        executor: Executor | None = None,
+        budget: float | None = None,
     ):
+        """
+        Args:
+        - select_recipes: exact solver, used unless a deadline or budget is
+          given.
+        - cache: menus found for previous requests, reused for identical ones.
+        - sum_index: index of the recipe repository's small menus, tried
+          before `select_recipes`. Recipes added through the repository must
+          be passed to its `add` by the caller; it is rebuilt if the
+          repository changed otherwise.
+        - executor: runs the searches of a batch of requests concurrently.
+        - budget: seconds a search without deadline may take. If given,
+          searches are routed by `estimate_menu_search` instead of using
+          `select_recipes`.
+        """
         self.recipe_repository = recipe_repository
         self.menu_repository = menu_repository
+        self.select_recipes = select_recipes
+        self.cache = cache
+        self.sum_index = sum_index
+        self.executor = executor
+        self.budget = budget
+
+    def __call__(
+        self,
+        size: int,
+        preferences_spec: list[DietaryPreferenceDTO],
+        deadline_ms: int | None = None,
+        alternatives: int = 0,
+        monitor: SearchMonitor | None = None,
+        started: float | None = None,
+    ) -> Menu:
+        """Creates a menu and adds it to the menu repository.
+
+        If `deadline_ms` is given, `select_recipes_local_search` returns the
+        best menu it finds within that many milliseconds since `started`
+        (the `time.monotonic()` the request arrived at, the call by default),
+        and the menu reports its optimality gap against `menu_lower_bound`.
+
+        Otherwise, if `alternatives` is given, the next best menus are found
+        in the same search (`select_menus_collapsed`), ranked in
+        `Menu.alternatives` and added to the menu repository too. Alternatives
+        are not searched for when there's a deadline, nor when their search
+        doesn't fit the budget: the menu is then found as if none were asked.
 
-    def __call__(self, size: int, preferences_spec: list[DietaryPreferenceDTO]) -> Menu:
+        Otherwise the sum index, if any, is looked up before searching.
+
+        Without a deadline, if there's a budget, the search engine is picked
+        by `estimate_menu_search`. If only the heuristic one fits, the menu is
+        the best it finds within the budget, with its optimality gap. If none
+        fits, `MenuSearchTooExpensive` is raised.
+
+        Menus found without a deadline are cached, if there's a cache: an
+        identical request on the same catalogue skips the search, but still
+        gets menus with new ids.
+
+        The search is watched by `monitor`, if any: once cancelled, it stops
+        with `SearchCancelled` and no menu is added.
+        """
+        if started is None:
+            started = time.monotonic()
+        version = self.recipe_repository.version()
         recipes = self.recipe_repository.all()
+        request = MenuRequestDTO(size, preferences_spec, deadline_ms, alternatives)
+        with monitored(monitor or SearchMonitor()):
+            menus = self._find_menus(version, recipes, request, started)
+        return self._add_menus(menus)
+
+    def batch(
+        self,
+        requests: Sequence[MenuRequestDTO],
+        monitor: SearchMonitor | None = None,
+    ) -> Iterator[Menu | Exception]:
+        """Creates a menu for each request, yielded in request order.
+
+        Same as calling the use case for each request, except that the
+        catalogue is read, and its identical recipes grouped, once: requests
+        only depending on nutrition and ingredients search one recipe of each
+        group. Identical requests (same `menu_request_key`, no deadline) are
+        solved once, each still getting menus with their own ids. Other
+        requests are solved on the executor, if any, and deadlines count from
+        when their solving starts. Errors (`DietaryPreferenceNotValid`,
+        `CannotCreateMenu`, `MenuSearchTooExpensive`) are yielded in place of
+        the menu of the request they are about.
+
+        Searches are watched by `monitor`, if any, which must not report
+        progress as they may run concurrently. Once cancelled, the batch
+        stops with `SearchCancelled`.
+        """
+        version = self.recipe_repository.version()
+        recipes = self.recipe_repository.all()
+        recipe_groups = _equivalent_recipe_groups(recipes)
+        # Index of each request's group, groups in order of first request.
+        groups: dict[object, int] = {}
+        firsts: list[MenuRequestDTO] = []
+        indices = []
+        for i, request in enumerate(requests):
+            if request.deadline_ms is None:
+                group: object = menu_request_key(
+                    request.size, request.preferences, request.alternatives
+                )
+            else:
+                group = i
+            if group not in groups:
+                groups[group] = len(firsts)
+                firsts.append(request)
+            indices.append(groups[group])
+
+        def find_menus(request: MenuRequestDTO) -> list[Menu] | Exception:
+            try:
+                with monitored(monitor or SearchMonitor()):
+                    return self._find_menus(
+                        version, recipes, request, time.monotonic(), recipe_groups
+                    )
+            except (
+                DietaryPreferenceNotValid,
+                CannotCreateMenu,
+                MenuSearchTooExpensive,
+            ) as e:
+                return e
+
+        map_ = map if self.executor is None else self.executor.map
+        results = map_(find_menus, firsts)
+        found: list[list[Menu] | Exception] = []
+        for index in indices:
+            while len(found) <= index:
+                found.append(next(results))
+            result = found[index]
+            yield result if isinstance(result, Exception) else self._add_menus(result)
+
+    def _find_menus(
+        self,
+        version: int,
+        recipes: list[Recipe],
+        request: MenuRequestDTO,
+        started: float,
+        groups: list[list[int]] | None = None,
+    ) -> list[Menu]:
+        """Returns menus for `request`, best first, from `recipes`.
+
+        If `groups` of identical recipes are given, only one recipe of each
+        is searched when preferences just depend on nutrition and ingredients.
+        """
+        size, preferences_spec = request.size, request.preferences
+        deadline_ms, alternatives = request.deadline_ms, request.alternatives
         try:
             preferences = create_preferences(preferences_spec)
         except (ValueError, TypeError):
             raise DietaryPreferenceNotValid()
+        key = None
+        if self.cache is not None and deadline_ms is None:
+            key = menu_request_key(size, preferences_spec, alternatives)
+            cached = self.cache.get(key, version)
+            if cached is not None:
+                return cached
+        all_recipes = recipes
+        if groups is not None and _depends_on_nutrition_and_ingredients(preferences):
+            # Identical recipes call for the same ingredients: a group is
+            # either forbidden or allowed as a whole.
+            allowed = {
+                r.id
+                for r in self._without_forbidden(
+                    [recipes[group[0]] for group in groups], preferences
+                )
+            }
+            groups = [group for group in groups if recipes[group[0]].id in allowed]
+            catalogue, recipes = recipes, [recipes[group[0]] for group in groups]
+        else:
+            groups = None
+            catalogue = recipes = self._without_forbidden(recipes, preferences)
         try:
-            meals = select_recipes_brute_force(recipes, size, preferences)
+            if deadline_ms is not None:
+                time_limit = deadline_ms / 1000 - (time.monotonic() - started)
+                ranked = [
+                    select_recipes_local_search(
+                        recipes, size, preferences, time_limit=max(time_limit, 0)
+                    )
+                ]
+                bound = menu_lower_bound(recipes, size, preferences)
+            elif alternatives > 0 and self._alternatives_fit(
+                recipes, size, preferences, alternatives
+            ):
+                ranked = [
+                    meals
+                    for _, meals in select_menus_collapsed(
+                        catalogue, size, preferences, alternatives + 1, groups
+                    )
+                ]
+                bound = None
+            else:
+                meals = None
+                if self.sum_index is not None:
+                    self.sum_index.refresh(version, all_recipes)
+                    meals = self.sum_index.nearest(size, preferences)
+                bound = None
+                if meals is None:
+                    if self.budget is None:
+                        meals = self.select_recipes(recipes, size, preferences)
+                    else:
+                        meals, bound = self._search_within(
+                            self.budget, recipes, size, preferences, started
+                        )
+                ranked = [meals]
         except ValueError:
             raise CannotCreateMenu()
-        menu = Menu(id=uuid4(), meals=meals)
-        self.menu_repository.add(menu)
+        costs = [preferences(meals) for meals in ranked]
+        # Exact searches return the best menu first.
+        optimum = costs[0] if bound is None else bound
+        menus = [
+            Menu(
+                id=uuid4(),
+                meals=meals,
+                cost=cost,
+                optimality_gap=0.0 if cost <= optimum else cost - optimum,
+            )
+            for meals, cost in zip(ranked, costs)
+        ]
+        # Heuristic menus may be improved on, and can't be kept up to date.
+        if self.cache is not None and key is not None and bound is None:
+            self.cache.put(key, version, menus, preferences)
+        return menus
+
+    def _alternatives_fit(
+        self,
+        recipes: list[Recipe],
+        size: int,
+        preferences: DietaryPreference,
+        alternatives: int,
+    ) -> bool:
+        if self.budget is None:
+            return True
+        estimate = estimate_menu_search(
+            recipes, size, preferences, self.budget, alternatives + 1
+        )
+        return estimate.engine is not None
+
+    def _search_within(
+        self,
+        budget: float,
+        recipes: list[Recipe],
+        size: int,
+        preferences: DietaryPreference,
+        started: float,
+    ) -> tuple[list[Recipe], float | None]:
+        """Returns meals found by the routed engine, with a lower bound if
+        they may not be the best ones."""
+        estimate = estimate_menu_search(recipes, size, preferences, budget)
+        if estimate.engine is None:
+            raise MenuSearchTooExpensive(estimate)
+        if estimate.engine != HEURISTIC_ENGINE:
+            select_recipes = MENU_ENGINES[estimate.engine]
+            return select_recipes(recipes, size, preferences), None
+        time_limit = budget - (time.monotonic() - started)
+        meals = select_recipes_local_search(
+            recipes, size, preferences, time_limit=max(time_limit, 0)
+        )
+        return meals, menu_lower_bound(recipes, size, preferences)
+
+    def estimate(
+        self,
+        size: int,
+        preferences_spec: list[DietaryPreferenceDTO],
+        alternatives: int = 0,
+    ) -> MenuEstimate:
+        """Returns the estimate a request without deadline is routed by.
+
+        If alternatives don't fit the budget, it's the estimate of the best
+        menu alone, which is then searched instead.
+        """
+        try:
+            preferences = create_preferences(preferences_spec)
+        except (ValueError, TypeError):
+            raise DietaryPreferenceNotValid()
+        recipes = self._without_forbidden(self.recipe_repository.all(), preferences)
+        budget = float("inf") if self.budget is None else self.budget
+        try:
+            estimate = estimate_menu_search(
+                recipes, size, preferences, budget, alternatives + 1
+            )
+            if estimate.engine is None and alternatives > 0:
+                estimate = estimate_menu_search(recipes, size, preferences, budget)
+            return estimate
+        except ValueError:
+            raise CannotCreateMenu()
+
+    def recipe_added(self, recipe: Recipe):
+        """Brings cached menus up to date with `recipe`, just added.
+
+        Meant to listen to the recipe repository. Only menus including the
+        new recipe can beat cached ones, so they alone are searched for
+        (`select_menus_branch_and_bound` with `including`) and merged into the
+        cached ranking, draws going to the menu `select_recipes_brute_force`
+        tests first. Entries found for an older catalogue, holding a recipe
+        `recipe` replaces, or whose search wouldn't fit the budget (every
+        menu including `recipe` being tested, at worst) are left to expire.
+
+        Searches run on the executor, if any, so that adding a recipe doesn't
+        wait for them; entries are only updated if no other recipe was added
+        meanwhile.
+        """
+        if self.cache is None:
+            return
+        version = self.recipe_repository.version()
+        entries = self.cache.entries_for(version - 1)
+        if not entries:
+            return
+        recipes = self.recipe_repository.all()
+        if self.executor is None:
+            self._update_cached(recipe, version, recipes, entries)
+        else:
+            self.executor.submit(self._update_cached, recipe, version, recipes, entries)
+
+    def _update_cached(
+        self,
+        recipe: Recipe,
+        version: int,
+        all_recipes: list[Recipe],
+        entries: list[tuple[MenuRequestKey, MenuCacheEntry]],
+    ):
+        cache = cast(MenuCache, self.cache)
+        for key, entry in entries:
+            size, alternatives, _ = key
+            # Fewer menus than asked: alternatives were dropped, or the
+            # catalogue was too small for them.
+            if (
+                entry.preferences is None
+                or len(entry.menus) <= alternatives
+                or any(
+                    meal.id == recipe.id for menu in entry.menus for meal in menu.meals
+                )
+            ):
+                continue
+            recipes = self._without_forbidden(all_recipes, entry.preferences)
+            ranked = [(cast(float, m.cost), m.meals) for m in entry.menus]
+            if recipe in recipes:
+                including = _seconds(
+                    math.comb(len(recipes) + size - 2, size - 1),
+                    BRANCH_AND_BOUND_MENUS_PER_SECOND,
+                )
+                if self.budget is not None and including > self.budget:
+                    continue
+                ranked += select_menus_branch_and_bound(
+                    recipes, size, entry.preferences, alternatives + 1, recipe
+                )
+            # Brute force tests menus in lexicographic order of recipe indices.
+            position = {r.id: i for i, r in enumerate(recipes)}
+            ranked.sort(key=lambda m: (m[0], [position[r.id] for r in m[1]]))
+            menus = [
+                Menu(id=uuid4(), meals=meals, cost=cost, optimality_gap=0.0)
+                for cost, meals in ranked[: alternatives + 1]
+            ]
+            cache.update(key, version - 1, version, menus)
+
+    def _add_menus(self, ranked: list[Menu]) -> Menu:
+        """Adds copies of `ranked` menus with new ids, returns the best one."""
+        menus = [
+            Menu(
+                id=uuid4(),
+                meals=list(m.meals),
+                cost=m.cost,
+                optimality_gap=m.optimality_gap,
+            )
+            for m in ranked
+        ]
+        menu = menus[0]
+        menu.alternatives = menus[1:]
+        for m in menus:
+            self.menu_repository.add(m)
         return menu
+
+    def _without_forbidden(
+        self, recipes: list[Recipe], preferences: DietaryPreference
+    ) -> list[Recipe]:
+        """Removes recipes `preferences` would never allow in a menu."""
+        forbidden: set[RecipeId] = set()
+        for ingredient_id in restricted_ingredients(preferences):
+            forbidden.update(
+                self.recipe_repository.find_ids_by_ingredient(ingredient_id)
+            )
+        if not forbidden:
+            return recipes
+        return [recipe for recipe in recipes if recipe.id not in forbidden]
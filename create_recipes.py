@@ -1,5 +1,6 @@
-from dataclasses import dataclass
-from typing import TypeAlias, Protocol, NamedTuple
+from collections.abc import Set as AbstractSet
+from dataclasses import KW_ONLY, InitVar, dataclass, field
+from typing import Any, TypeAlias, Protocol, NamedTuple
 from uuid import UUID, uuid4
 
 
@@ -37,6 +38,11 @@ class Recipe:
 
     In this context we simply care about list of ingredients and quantities.
 
+    Per-serving nutrition is computed when the recipe is built, unless given
+    as `per_serving` (read from a snapshot, say), and kept until
+    `ingredients` or `yield_` are assigned again (mutating the ingredients
+    list in place is not noticed).
+
     Properties:
     - ingredients: list of (quantity, ingredient) tuples the recipe calls for.
     - yields_: number servings the recipe provides.
@@ -46,6 +52,20 @@ class Recipe:
     name: str
     ingredients: list[tuple[float, Ingredient]]
     yield_: int
+    _: KW_ONLY
+    # Macros and kilocalories per serving, trusted to match the ingredients.
+    per_serving: InitVar[tuple[MacroNutrients, float] | None] = None
+    _per_serving: tuple[MacroNutrients, float] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self, per_serving: tuple[MacroNutrients, float] | None):
+        self._per_serving = per_serving or self._compute_per_serving()
+
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        if name in ("ingredients", "yield_"):
+            super().__setattr__("_per_serving", None)
 
     def contains(self, ingredient: Ingredient | IngredientId) -> bool:
         ingredient_id = (
@@ -54,21 +74,29 @@ class Recipe:
         return any([i[1].id == ingredient_id for i in self.ingredients])
 
     def macros_per_serving(self) -> MacroNutrients:
+        if self._per_serving is None:
+            self._per_serving = self._compute_per_serving()
+        return self._per_serving[0]
+
+    def kilocalories_per_serving(self) -> float:
+        if self._per_serving is None:
+            self._per_serving = self._compute_per_serving()
+        return self._per_serving[1]
+
+    def _compute_per_serving(self) -> tuple[MacroNutrients, float]:
         (total_carbohydrate, total_protein, total_fat) = 0.0, 0.0, 0.0
         for weight, ingredient in self.ingredients:
             carbohydrates, proteins, fats = ingredient.macronutrients
             total_carbohydrate += weight * carbohydrates / 100
             total_protein += weight * proteins / 100
             total_fat += weight * fats / 100
-        return MacroNutrients(
+        macros = MacroNutrients(
             total_carbohydrate / self.yield_,
             total_protein / self.yield_,
             total_fat / self.yield_,
         )
-
-    def kilocalories_per_serving(self) -> float:
         total_kilocalories = sum(w * i.kilocalories / 100 for w, i in self.ingredients)
-        return total_kilocalories / self.yield_
+        return macros, total_kilocalories / self.yield_
 
 
 @dataclass
@@ -89,6 +117,12 @@ class RecipeRepository(Protocol):
 
     def add(self, recipe: Recipe): ...
 
+    def find_ids_by_ingredient(
+        self, ingredient_id: IngredientId
+    ) -> AbstractSet[RecipeId]: ...
+
+    def version(self) -> int: ...
+
 
 class IngredientNotFound(Exception):
     pass
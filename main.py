@@ -1,12 +1,23 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+import asyncio
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Annotated, Any
+
+from fastapi import Depends, FastAPI, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, PositiveInt
 
 from create_recipes import (
     IngredientId,
     Recipe,
     RecipeDTO,
     RecipeId,
+    RecipeRepository,
     CreateRecipeUseCase,
     GetRecipeUseCase,
     RecipeNotFound,
@@ -18,26 +29,288 @@ from create_menu import (
     MenuId,
     GetMenuUseCase,
     CreateMenuUseCase,
+    MenuRequestDTO,
+    MenuCache,
+    MenuSumIndex,
     MenuNotFound,
     CannotCreateMenu,
     DietaryPreferenceDTO,
     DietaryPreferenceNotValid,
+    MenuEstimate,
+    MenuSearchTooExpensive,
+    SearchMonitor,
+    SearchProgress,
+)
+from menu_jobs import (
+    MenuJob,
+    MenuJobId,
+    MenuJobNotFound,
+    MenuJobQueue,
+    MenuJobQueueFull,
+    MenuJobStatus,
 )
 from repositories import (
     InMemoryRecipeRepository,
-    InMemoryMenuRepository,
     InMemoryIngredientRepository,
+    BoundedMenuRepository,
+    MenuStoreStats,
+    SQLiteConnectionPool,
+    SQLiteIngredientRepository,
+    SQLiteMenuRepository,
+    SQLiteRecipeRepository,
+)
+from snapshot import (
+    CatalogueSnapshot,
+    SnapshotIngredientRepository,
+    SnapshotRecipeRepository,
 )
 
-app = FastAPI()
 
-recipe_repo = InMemoryRecipeRepository.from_file("data/recipes.json")
-ingredient_repo = InMemoryIngredientRepository.from_file("data/ingredients.json")
-menu_repo = InMemoryMenuRepository()
-get_recipe = GetRecipeUseCase(recipe_repo)
-create_recipe = CreateRecipeUseCase(recipe_repo, ingredient_repo)
-get_menu = GetMenuUseCase(menu_repo)
-create_menu = CreateMenuUseCase(recipe_repo, menu_repo)
+class SolverPoolFull(Exception):
+    pass
+
+
+class SolverPool:
+    """Thread pool running menu searches off the event loop.
+
+    At most `max_workers` searches run at once and `max_queued` more wait for
+    a worker; submitting beyond that raises `SolverPoolFull`.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        if not self.slots.acquire(blocking=False):
+            raise SolverPoolFull()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+
+# Searches running longer than this many seconds are cancelled.
+MENU_SOLVE_TIMEOUT = float(os.environ.get("MENU_SOLVE_TIMEOUT", "30"))
+# How often, in seconds, a waiting request checks whether its client is gone.
+DISCONNECT_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class Services:
+    """Repositories and use cases the endpoints call, see `create_services`."""
+
+    ingredient_repo: (
+        InMemoryIngredientRepository
+        | SQLiteIngredientRepository
+        | SnapshotIngredientRepository
+    )
+    recipe_repo: (
+        InMemoryRecipeRepository | SQLiteRecipeRepository | SnapshotRecipeRepository
+    )
+    menu_repo: BoundedMenuRepository | SQLiteMenuRepository
+    get_recipe: GetRecipeUseCase
+    create_recipe: CreateRecipeUseCase
+    get_menu: GetMenuUseCase
+    create_menu: CreateMenuUseCase
+    solver_pool: SolverPool
+    menu_jobs: MenuJobQueue
+
+    def shutdown(self):
+        """Stops workers once running searches finish, dropping queued ones."""
+        self.menu_jobs.shutdown()
+        self.solver_pool.executor.shutdown(cancel_futures=True)
+        if self.create_menu.executor is not None:
+            self.create_menu.executor.shutdown(cancel_futures=True)
+
+
+def create_menu_store(recipe_repo: RecipeRepository) -> BoundedMenuRepository:
+    """Returns repository keeping menus in memory, bounded as configured."""
+    spill = None
+    if "MENU_STORE_SPILL" in os.environ:
+        # SQLite file evicted menus are moved to, and still found in.
+        spill = SQLiteMenuRepository(
+            SQLiteConnectionPool(os.environ["MENU_STORE_SPILL"]), recipe_repo
+        )
+    max_bytes = os.environ.get("MENU_STORE_MAX_BYTES")
+    ttl = os.environ.get("MENU_STORE_TTL")
+    return BoundedMenuRepository(
+        max_menus=int(os.environ.get("MENU_STORE_MAX_MENUS", "10000")),
+        max_bytes=None if max_bytes is None else int(max_bytes),
+        # Seconds menus are kept after being last read.
+        ttl=None if ttl is None else float(ttl),
+        spill=spill,
+    )
+
+
+def create_services() -> Services:
+    """Returns services as configured by environment variables.
+
+    Loads the catalogue, and returns once precomputations (recipes'
+    nutrition, the menu sum index) are done, so that first requests are as
+    fast as the next ones.
+    """
+    ingredient_repo: (
+        InMemoryIngredientRepository
+        | SQLiteIngredientRepository
+        | SnapshotIngredientRepository
+    )
+    recipe_repo: (
+        InMemoryRecipeRepository | SQLiteRecipeRepository | SnapshotRecipeRepository
+    )
+    menu_repo: BoundedMenuRepository | SQLiteMenuRepository
+    # "memory" (catalogue read from data files on every start) or "sqlite".
+    storage = os.environ.get("MEAL_PLANNER_STORAGE", "memory")
+    if storage == "sqlite":
+        database = SQLiteConnectionPool(
+            os.environ.get("MEAL_PLANNER_DATABASE", "data/meal_planner.sqlite3"),
+            size=int(os.environ.get("MEAL_PLANNER_DATABASE_CONNECTIONS", "8")),
+        )
+        ingredient_repo = SQLiteIngredientRepository(database)
+        recipe_repo = SQLiteRecipeRepository(database)
+        menu_repo = SQLiteMenuRepository(database, recipe_repo)
+        # A new database is filled from the data files.
+        if ingredient_repo.count() == 0:
+            ingredient_repo.add(
+                *InMemoryIngredientRepository.from_file(
+                    "data/ingredients.json"
+                ).ingredients.values()
+            )
+        if recipe_repo.version() == 0:
+            for recipe in InMemoryRecipeRepository.from_file(
+                "data/recipes.json", ingredient_repo
+            ).all():
+                recipe_repo.add(recipe)
+    elif storage == "memory" and "MEAL_PLANNER_SNAPSHOT" in os.environ:
+        # Exported by `python snapshot.py`, mapped rather than parsed.
+        catalogue_snapshot = CatalogueSnapshot(os.environ["MEAL_PLANNER_SNAPSHOT"])
+        ingredient_repo = SnapshotIngredientRepository(catalogue_snapshot)
+        recipe_repo = SnapshotRecipeRepository(catalogue_snapshot)
+        menu_repo = create_menu_store(recipe_repo)
+    elif storage == "memory":
+        ingredient_repo = InMemoryIngredientRepository.from_file(
+            "data/ingredients.json"
+        )
+        recipe_repo = InMemoryRecipeRepository.from_file(
+            "data/recipes.json", ingredient_repo
+        )
+        menu_repo = create_menu_store(recipe_repo)
+    else:
+        raise ValueError(f"Unknown MEAL_PLANNER_STORAGE: {storage}")
+    # Menus of up to this many meals are answered from precomputed nutrition
+    # sums. Memory grows with the number of recipes to the power of this size.
+    # Building it also builds every recipe, and their nutrition.
+    # Read first: a recipe added meanwhile only makes the index rebuild.
+    version = recipe_repo.version()
+    menu_sum_index = MenuSumIndex(
+        recipe_repo.all(),
+        max_size=int(os.environ.get("MENU_SUM_INDEX_MAX_SIZE", "2")),
+        version=version,
+    )
+    recipe_repo.subscribe(menu_sum_index.add)
+    create_menu = CreateMenuUseCase(
+        recipe_repo,
+        menu_repo,
+        cache=MenuCache(),
+        sum_index=menu_sum_index,
+        executor=ThreadPoolExecutor(),
+        # Seconds a search without deadline may take, see `POST /menus/estimate`.
+        budget=float(os.environ.get("MENU_SEARCH_BUDGET", "10")),
+    )
+    recipe_repo.subscribe(create_menu.recipe_added)
+    return Services(
+        ingredient_repo=ingredient_repo,
+        recipe_repo=recipe_repo,
+        menu_repo=menu_repo,
+        get_recipe=GetRecipeUseCase(recipe_repo),
+        create_recipe=CreateRecipeUseCase(recipe_repo, ingredient_repo),
+        get_menu=GetMenuUseCase(menu_repo),
+        create_menu=create_menu,
+        solver_pool=SolverPool(
+            max_workers=int(os.environ.get("MENU_SOLVER_WORKERS", os.cpu_count() or 1)),
+            max_queued=int(os.environ.get("MENU_SOLVER_QUEUE_SIZE", "32")),
+        ),
+        menu_jobs=MenuJobQueue(
+            create_menu,
+            workers=int(os.environ.get("MENU_JOB_WORKERS", "1")),
+            max_queued=int(os.environ.get("MENU_JOB_QUEUE_SIZE", "1000")),
+            ttl=float(os.environ.get("MENU_JOB_TTL", "3600")),
+        ),
+    )
+
+
+@dataclass
+class Startup:
+    """State of the services, created when the app starts.
+
+    Properties:
+    - services: created services, None until ready.
+    - error: why services couldn't be created, if they couldn't.
+    - task: creating services in the background, if they are.
+    """
+
+    services: Services | None = None
+    error: BaseException | None = None
+    task: asyncio.Task | None = None
+
+    async def start(self):
+        # In a thread, so that probes are answered meanwhile.
+        try:
+            self.services = await asyncio.to_thread(create_services)
+        except Exception as e:
+            self.error = e
+            raise
+
+
+startup = Startup()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    startup.services, startup.error, startup.task = None, None, None
+    # Serve (probes) while services are being created, rather than only once
+    # they are: see `GET /readyz`.
+    if os.environ.get("MEAL_PLANNER_BACKGROUND_STARTUP", "") in ("1", "true"):
+        startup.task = asyncio.create_task(startup.start())
+    else:
+        await startup.start()
+    try:
+        yield
+    finally:
+        if startup.task is not None:
+            startup.task.cancel()
+        if startup.services is not None:
+            services, startup.services = startup.services, None
+            services.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+class ServicesNotReady(Exception):
+    pass
+
+
+def ready_services() -> Services:
+    """Returns services, raises `ServicesNotReady` while they are created."""
+    if startup.services is None:
+        raise ServicesNotReady()
+    return startup.services
+
+
+ReadyServices = Annotated[Services, Depends(ready_services)]
+
+
+@app.exception_handler(ServicesNotReady)
+async def services_not_ready_handler(request: Request, e: ServicesNotReady):
+    return JSONResponse(
+        status_code=503,
+        content={"message": "Service is starting"},
+        headers={"Retry-After": "1"},
+    )
 
 
 class Message(BaseModel):
@@ -67,16 +340,163 @@ class RecipeResponse(BaseModel):
 class MenuResponse(BaseModel):
     id: MenuId
     meals: list[RecipeResponse]
+    cost: float | None = None
+    optimality_gap: float | None = None
+    alternatives: list["MenuResponse"] = []
 
     @staticmethod
     def from_menu(menu: Menu) -> "MenuResponse":
         meals = [RecipeResponse.from_recipe(r) for r in menu.meals]
-        return MenuResponse(id=menu.id, meals=meals)
+        return MenuResponse(
+            id=menu.id,
+            meals=meals,
+            cost=menu.cost,
+            optimality_gap=menu.optimality_gap,
+            alternatives=[MenuResponse.from_menu(m) for m in menu.alternatives],
+        )
+
+
+# Searches, stored menus and responses all grow with the alternatives asked.
+MENU_MAX_ALTERNATIVES = 10
+# Even deadline searches take time and memory growing with the menu size.
+MENU_MAX_SIZE = 100
 
 
 class MenuRequest(BaseModel):
-    size: int = 7
+    size: int = Field(7, le=MENU_MAX_SIZE)
     preferences: list[DietaryPreferenceDTO] = []
+    # Return the best menu found within this many milliseconds.
+    deadline_ms: PositiveInt | None = None
+    # Number of next best menus to return along with the best one.
+    alternatives: int = Field(0, ge=0, le=MENU_MAX_ALTERNATIVES)
+
+    def to_dto(self) -> MenuRequestDTO:
+        return MenuRequestDTO(
+            self.size, self.preferences, self.deadline_ms, self.alternatives
+        )
+
+
+def menu_error(error: Exception) -> tuple[int, str]:
+    """Returns status code and message `POST /menus` responds `error` with."""
+    if isinstance(error, DietaryPreferenceNotValid):
+        return 400, "Provided dietary preference is not valid"
+    if isinstance(error, MenuSearchTooExpensive):
+        return 422, "Menu search would take too long, ask for fewer meals"
+    return 500, "Cannot create menu"
+
+
+class MenuBatchResult(BaseModel):
+    # Status code and body `POST /menus` would have responded with.
+    status: int
+    menu: MenuResponse | None = None
+    message: str | None = None
+
+    @staticmethod
+    def from_result(result: Menu | Exception) -> "MenuBatchResult":
+        if isinstance(result, Exception):
+            status, message = menu_error(result)
+            return MenuBatchResult(status=status, message=message)
+        return MenuBatchResult(status=200, menu=MenuResponse.from_menu(result))
+
+
+class SearchProgressResponse(BaseModel):
+    best_cost: float | None
+    # Menus, or partial menus, scored so far.
+    evaluated: int
+    # Partial menus discarded by their lower bound.
+    pruned: int
+    elapsed_ms: float
+
+    @staticmethod
+    def from_progress(progress: SearchProgress) -> "SearchProgressResponse":
+        return SearchProgressResponse(
+            best_cost=progress.best_cost,
+            evaluated=progress.evaluated,
+            pruned=progress.pruned,
+            elapsed_ms=1000 * progress.elapsed,
+        )
+
+
+class MenuJobResponse(BaseModel):
+    id: MenuJobId
+    status: MenuJobStatus
+    # Milliseconds spent waiting for a worker, then solving, so far.
+    queued_ms: float
+    running_ms: float | None = None
+    progress: SearchProgressResponse | None = None
+    menu: MenuResponse | None = None
+    # Why the job failed, as `POST /menus` would have put it.
+    message: str | None = None
+
+    @staticmethod
+    def from_job(job: MenuJob) -> "MenuJobResponse":
+        now = time.monotonic()
+        started = job.started if job.started is not None else now
+        finished = job.finished if job.finished is not None else now
+        return MenuJobResponse(
+            id=job.id,
+            status=job.status,
+            queued_ms=1000 * (started - job.created),
+            running_ms=None if job.started is None else 1000 * (finished - started),
+            progress=(
+                None
+                if job.progress is None
+                else SearchProgressResponse.from_progress(job.progress)
+            ),
+            menu=None if job.menu is None else MenuResponse.from_menu(job.menu),
+            message=None if job.error is None else menu_error(job.error)[1],
+        )
+
+
+class MenuEstimateResponse(BaseModel):
+    # Number of menus an exhaustive search would test.
+    candidates: int
+    # Estimated worst case seconds by search engine.
+    seconds: dict[str, float]
+    # Engine the menu would be searched with, none if it would be rejected.
+    engine: str | None
+    budget: float | None
+
+    @staticmethod
+    def from_estimate(
+        estimate: MenuEstimate, budget: float | None
+    ) -> "MenuEstimateResponse":
+        return MenuEstimateResponse(
+            candidates=estimate.candidates,
+            seconds=estimate.seconds,
+            engine=estimate.engine,
+            budget=budget,
+        )
+
+
+class MenuStoreStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    spill_hits: int
+    evictions: int
+    expirations: int
+    menus: int
+    bytes: int
+
+    @staticmethod
+    def from_stats(stats: MenuStoreStats) -> "MenuStoreStatsResponse":
+        return MenuStoreStatsResponse(**asdict(stats))
+
+
+class MenuStreamError(BaseModel):
+    # Status code `POST /menus` would have responded with.
+    status: int
+    message: str
+
+
+def server_sent_event(event: str, data: BaseModel) -> str:
+    return f"event: {event}\ndata: {data.model_dump_json()}\n\n"
+
+
+# Seconds between two progress events of a streamed menu search.
+MENU_STREAM_PROGRESS_INTERVAL = 0.25
+# Larger batches are streamed as newline-delimited JSON, one result per line.
+MENU_BATCH_STREAM_THRESHOLD = 100
 
 
 @app.get(
@@ -84,9 +504,9 @@ class MenuRequest(BaseModel):
     response_model=RecipeResponse,
     responses={404: {"model": Message}},
 )
-async def get_recipe_endpoint(recipe_id: RecipeId):
+async def get_recipe_endpoint(recipe_id: RecipeId, services: ReadyServices):
     try:
-        recipe = get_recipe(recipe_id)
+        recipe = services.get_recipe(recipe_id)
         return RecipeResponse.from_recipe(recipe)
     except RecipeNotFound:
         return JSONResponse(status_code=404, content={"message": "Recipe not found"})
@@ -95,9 +515,9 @@ async def get_recipe_endpoint(recipe_id: RecipeId):
 @app.post(
     "/recipes", response_model=RecipeResponse, responses={404: {"model": Message}}
 )
-async def create_recipe_endpoint(recipe_request: RecipeDTO):
+async def create_recipe_endpoint(recipe_request: RecipeDTO, services: ReadyServices):
     try:
-        recipe = create_recipe(recipe_request)
+        recipe = services.create_recipe(recipe_request)
         return RecipeResponse.from_recipe(recipe)
     except IngredientNotFound:
         return JSONResponse(
@@ -110,23 +530,274 @@ async def create_recipe_endpoint(recipe_request: RecipeDTO):
     response_model=MenuResponse,
     responses={404: {"model": Message}},
 )
-async def get_menu_endpoint(menu_id: MenuId):
+async def get_menu_endpoint(menu_id: MenuId, services: ReadyServices):
     try:
-        menu = get_menu(menu_id)
+        menu = services.get_menu(menu_id)
         return MenuResponse.from_menu(menu)
     except MenuNotFound:
         return JSONResponse(status_code=404, content={"message": "Menu not found"})
 
 
-@app.post("/menus", response_model=MenuResponse, responses={404: {"model": Message}})
-async def create_menu_endpoint(menu_request: MenuRequest):
+@app.get(
+    "/menus/jobs/{job_id}",
+    response_model=MenuJobResponse,
+    responses={404: {"model": Message}},
+)
+async def get_menu_job_endpoint(job_id: MenuJobId, services: ReadyServices):
+    try:
+        return MenuJobResponse.from_job(services.menu_jobs.find(job_id))
+    except MenuJobNotFound:
+        return JSONResponse(status_code=404, content={"message": "Job not found"})
+
+
+@app.get(
+    "/menus/store/stats",
+    response_model=MenuStoreStatsResponse,
+    responses={404: {"model": Message}},
+)
+async def get_menu_store_stats_endpoint(services: ReadyServices):
+    if not isinstance(services.menu_repo, BoundedMenuRepository):
+        return JSONResponse(
+            status_code=404, content={"message": "Menus are stored in a database"}
+        )
+    return MenuStoreStatsResponse.from_stats(services.menu_repo.stats())
+
+
+@app.post(
+    "/menus",
+    response_model=MenuResponse,
+    responses={
+        202: {"model": MenuJobResponse},
+        404: {"model": Message},
+        422: {"model": Message},
+        503: {"model": Message},
+    },
+)
+async def create_menu_endpoint(
+    menu_request: MenuRequest,
+    request: Request,
+    services: ReadyServices,
+    # Solve in the background, see `GET /menus/jobs/{job_id}`.
+    async_: bool = Query(False, alias="async"),
+):
+    if async_:
+        try:
+            job = services.menu_jobs.submit(menu_request.to_dto())
+        except MenuJobQueueFull:
+            return JSONResponse(
+                status_code=503,
+                content={"message": "Too many menus being created"},
+                headers={"Retry-After": "1"},
+            )
+        return JSONResponse(
+            status_code=202,
+            content=MenuJobResponse.from_job(job).model_dump(mode="json"),
+            headers={"Location": f"/menus/jobs/{job.id}"},
+        )
+    # Deadlines include time spent waiting for a solver.
+    started = time.monotonic()
+    cancelled = threading.Event()
+    try:
+        future = services.solver_pool.submit(
+            services.create_menu,
+            menu_request.size,
+            menu_request.preferences,
+            menu_request.deadline_ms,
+            menu_request.alternatives,
+            monitor=SearchMonitor(cancelled),
+            started=started,
+        )
+    except SolverPoolFull:
+        return JSONResponse(
+            status_code=503,
+            content={"message": "Too many menus being created"},
+            headers={"Retry-After": "1"},
+        )
+    solve = asyncio.wrap_future(future)
+    while True:
+        done, _ = await asyncio.wait([solve], timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            break
+        disconnected = await request.is_disconnected()
+        if disconnected or time.monotonic() - started > MENU_SOLVE_TIMEOUT:
+            # Stops a running search, drops a queued one.
+            cancelled.set()
+            solve.cancel()
+            if disconnected:
+                # Nobody is left to read it.
+                return Response(status_code=499)
+            return JSONResponse(
+                status_code=504, content={"message": "Menu creation timed out"}
+            )
     try:
-        menu = create_menu(menu_request.size, menu_request.preferences)
+        menu = solve.result()
         return MenuResponse.from_menu(menu)
-    except DietaryPreferenceNotValid:
+    except (DietaryPreferenceNotValid, CannotCreateMenu, MenuSearchTooExpensive) as e:
+        status, message = menu_error(e)
+        return JSONResponse(status_code=status, content={"message": message})
+
+
+@app.post("/menus/stream", responses={503: {"model": Message}})
+async def stream_menu_endpoint(menu_request: MenuRequest, services: ReadyServices):
+    """Streams `progress` events while searching, then a `menu` or `error` one."""
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    # Progress of the search, then None once it's over.
+    events: asyncio.Queue[SearchProgress | None] = asyncio.Queue()
+    cancelled = threading.Event()
+    monitor = SearchMonitor(
+        cancelled,
+        on_progress=lambda p: loop.call_soon_threadsafe(events.put_nowait, p),
+        interval=MENU_STREAM_PROGRESS_INTERVAL,
+    )
+    try:
+        future = services.solver_pool.submit(
+            services.create_menu,
+            menu_request.size,
+            menu_request.preferences,
+            menu_request.deadline_ms,
+            menu_request.alternatives,
+            monitor=monitor,
+            started=started,
+        )
+    except SolverPoolFull:
         return JSONResponse(
-            status_code=400,
-            content={"message": "Provided dietary preference is not valid"},
+            status_code=503,
+            content={"message": "Too many menus being created"},
+            headers={"Retry-After": "1"},
         )
-    except CannotCreateMenu:
-        return JSONResponse(status_code=500, content={"message": "Cannot create menu"})
+    future.add_done_callback(
+        lambda _: loop.call_soon_threadsafe(events.put_nowait, None)
+    )
+
+    async def stream() -> AsyncIterator[str]:
+        timeout = started + MENU_SOLVE_TIMEOUT
+        try:
+            while True:
+                progress = await asyncio.wait_for(
+                    events.get(), timeout - time.monotonic()
+                )
+                if progress is None:
+                    break
+                yield server_sent_event(
+                    "progress", SearchProgressResponse.from_progress(progress)
+                )
+            yield server_sent_event("menu", MenuResponse.from_menu(future.result()))
+        except TimeoutError:
+            yield server_sent_event(
+                "error", MenuStreamError(status=504, message="Menu creation timed out")
+            )
+        except (
+            DietaryPreferenceNotValid,
+            CannotCreateMenu,
+            MenuSearchTooExpensive,
+        ) as e:
+            status, message = menu_error(e)
+            yield server_sent_event(
+                "error", MenuStreamError(status=status, message=message)
+            )
+        finally:
+            # Stops the search if the client left, or it timed out.
+            cancelled.set()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@app.post(
+    "/menus/estimate",
+    response_model=MenuEstimateResponse,
+    responses={400: {"model": Message}},
+)
+async def estimate_menu_endpoint(menu_request: MenuRequest, services: ReadyServices):
+    # Deadlines are ignored: the search engine is then always the heuristic.
+    try:
+        estimate = services.create_menu.estimate(
+            menu_request.size, menu_request.preferences, menu_request.alternatives
+        )
+        return MenuEstimateResponse.from_estimate(estimate, services.create_menu.budget)
+    except (DietaryPreferenceNotValid, CannotCreateMenu) as e:
+        status, message = menu_error(e)
+        return JSONResponse(status_code=status, content={"message": message})
+
+
+@app.post(
+    "/menus/batch",
+    response_model=list[MenuBatchResult],
+    responses={503: {"model": Message}},
+)
+async def create_menus_endpoint(
+    menu_requests: list[MenuRequest], services: ReadyServices
+):
+    """Searches the batch in one solver, within `MENU_SOLVE_TIMEOUT` overall.
+
+    Requests without a result by then get a 504 one.
+    """
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    # Results in request order, then None once the batch is over.
+    results: asyncio.Queue[Menu | Exception | None] = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def solve():
+        for result in services.create_menu.batch(
+            [r.to_dto() for r in menu_requests], SearchMonitor(cancelled)
+        ):
+            loop.call_soon_threadsafe(results.put_nowait, result)
+
+    try:
+        future = services.solver_pool.submit(solve)
+    except SolverPoolFull:
+        return JSONResponse(
+            status_code=503,
+            content={"message": "Too many menus being created"},
+            headers={"Retry-After": "1"},
+        )
+    future.add_done_callback(
+        lambda _: loop.call_soon_threadsafe(results.put_nowait, None)
+    )
+
+    async def batch_results() -> AsyncIterator[MenuBatchResult]:
+        answered = 0
+        try:
+            while answered < len(menu_requests):
+                result = await asyncio.wait_for(
+                    results.get(), started + MENU_SOLVE_TIMEOUT - time.monotonic()
+                )
+                if result is None:
+                    # Only before every result if the batch failed: raises why.
+                    future.result()
+                    break
+                yield MenuBatchResult.from_result(result)
+                answered += 1
+        except TimeoutError:
+            timed_out = MenuBatchResult(status=504, message="Menu creation timed out")
+            for _ in range(answered, len(menu_requests)):
+                yield timed_out
+        finally:
+            # Stops the search if the client left, or it timed out.
+            cancelled.set()
+
+    if len(menu_requests) <= MENU_BATCH_STREAM_THRESHOLD:
+        return [result async for result in batch_results()]
+
+    async def lines() -> AsyncIterator[str]:
+        async for result in batch_results():
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/healthz", response_model=Message, responses={500: {"model": Message}})
+async def health_endpoint():
+    """Liveness probe: fails only if services can't be created."""
+    if startup.error is not None:
+        return JSONResponse(status_code=500, content={"message": "Startup failed"})
+    return Message(message="Alive")
+
+
+@app.get("/readyz", response_model=Message, responses={503: {"model": Message}})
+async def ready_endpoint():
+    """Readiness probe: fails until services are created and warmed up."""
+    if startup.services is None:
+        return JSONResponse(status_code=503, content={"message": "Not ready"})
+    return Message(message="Ready")
@@ -0,0 +1,171 @@
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import TypeAlias, cast
+from uuid import UUID, uuid4
+
+from create_menu import (
+    CannotCreateMenu,
+    CreateMenuUseCase,
+    DietaryPreferenceNotValid,
+    Menu,
+    MenuRequestDTO,
+    MenuRequestKey,
+    MenuSearchTooExpensive,
+    SearchMonitor,
+    SearchProgress,
+    menu_request_key,
+)
+
+logger = logging.getLogger(__name__)
+
+MenuJobId: TypeAlias = UUID
+
+
+class MenuJobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class MenuJob:
+    """Menu request solved in the background.
+
+    Properties:
+    - progress: latest progress of the search, if it reported any.
+    - menu: created menu (already added to the menu repository) once done.
+    - error: exception raised by the use case if failed.
+    """
+
+    id: MenuJobId
+    request: MenuRequestDTO
+    created: float
+    status: MenuJobStatus = MenuJobStatus.QUEUED
+    started: float | None = None
+    finished: float | None = None
+    progress: SearchProgress | None = None
+    menu: Menu | None = None
+    error: Exception | None = None
+    key: MenuRequestKey | None = field(default=None, repr=False)
+
+
+class MenuJobNotFound(Exception):
+    pass
+
+
+class MenuJobQueueFull(Exception):
+    pass
+
+
+class MenuJobQueue:
+    """In-process queue of menu requests, solved by a pool of worker threads.
+
+    Requests identical (same `menu_request_key`, no deadline) to a queued or
+    running one join its job instead of being solved again. At most
+    `max_queued` jobs wait for a worker; finished jobs are forgotten `ttl`
+    seconds after finishing.
+    """
+
+    def __init__(
+        self,
+        create_menu: CreateMenuUseCase,
+        workers: int = 1,
+        max_queued: int = 1000,
+        ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+        progress_interval: float = 0.5,
+    ):
+        self.create_menu = create_menu
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.clock = clock
+        self.progress_interval = progress_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs: dict[MenuJobId, MenuJob] = {}
+        # Queued or running jobs by request key, for deduplication.
+        self.in_flight: dict[MenuRequestKey, MenuJob] = {}
+        # Finished jobs, oldest first, for expiry.
+        self.finished: deque[MenuJob] = deque()
+        self.queued = 0
+        self.lock = threading.Lock()
+
+    def submit(self, request: MenuRequestDTO) -> MenuJob:
+        with self.lock:
+            self._expire()
+            key = None
+            if request.deadline_ms is None:
+                key = menu_request_key(
+                    request.size, request.preferences, request.alternatives
+                )
+                if key in self.in_flight:
+                    return self.in_flight[key]
+            if self.queued >= self.max_queued:
+                raise MenuJobQueueFull()
+            job = MenuJob(id=uuid4(), request=request, created=self.clock(), key=key)
+            self.jobs[job.id] = job
+            if key is not None:
+                self.in_flight[key] = job
+            self.queued += 1
+        self.executor.submit(self._run, job)
+        return job
+
+    def find(self, job_id: MenuJobId) -> MenuJob:
+        with self.lock:
+            self._expire()
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise MenuJobNotFound()
+        return job
+
+    def shutdown(self):
+        """Stops workers once running jobs finish, dropping queued ones."""
+        self.executor.shutdown(cancel_futures=True)
+
+    def _run(self, job: MenuJob):
+        with self.lock:
+            self.queued -= 1
+            job.status = MenuJobStatus.RUNNING
+            job.started = self.clock()
+        request = job.request
+        menu: Menu | None = None
+        error: Exception | None = None
+        try:
+            menu = self.create_menu(
+                request.size,
+                request.preferences,
+                request.deadline_ms,
+                request.alternatives,
+                monitor=SearchMonitor(
+                    on_progress=lambda progress: setattr(job, "progress", progress),
+                    interval=self.progress_interval,
+                ),
+            )
+        except (
+            DietaryPreferenceNotValid,
+            CannotCreateMenu,
+            MenuSearchTooExpensive,
+        ) as e:
+            error = e
+        except Exception as e:
+            # Still fails the job, rather than leaving it running forever.
+            logger.exception("Menu job %s failed unexpectedly", job.id)
+            error = e
+        with self.lock:
+            job.menu, job.error = menu, error
+            job.status = MenuJobStatus.DONE if error is None else MenuJobStatus.FAILED
+            job.finished = self.clock()
+            if job.key is not None and self.in_flight.get(job.key) is job:
+                del self.in_flight[job.key]
+            self.finished.append(job)
+
+    def _expire(self):
+        now = self.clock()
+        while self.finished and now - cast(float, self.finished[0].finished) > self.ttl:
+            del self.jobs[self.finished.popleft().id]
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Any, Iterable, Protocol
+from collections.abc import Iterable, Sequence
+from typing import Any, Protocol, runtime_checkable
 
 from create_recipes import IngredientId, Recipe
 
@@ -14,8 +15,103 @@ class DietaryPreference(Protocol):
     def __call__(self, recipes: Iterable[Recipe]) -> float: ...
 
 
+@runtime_checkable
+class BoundedPreference(DietaryPreference, Protocol):
+    """Dietary preference that can bound the cost of a partial menu.
+
+    `lower_bound` must never be higher than the cost of any menu of `size`
+    meals made of `recipes` plus `size - len(recipes)` meals picked from
+    `candidates`. Used by search engines to discard partial menus early.
+    """
+
+    def lower_bound(
+        self, recipes: Sequence[Recipe], candidates: Sequence[Recipe], size: int
+    ) -> float: ...
+
+
+def preference_lower_bound(
+    preference: DietaryPreference,
+    recipes: Sequence[Recipe],
+    candidates: Sequence[Recipe],
+    size: int,
+) -> float:
+    """Returns lower bound for `preference`, or 0 if it can't provide one.
+
+    Costs are assumed to be non-negative, which makes 0 a valid bound.
+    """
+    if isinstance(preference, BoundedPreference):
+        return preference.lower_bound(recipes, candidates, size)
+    return 0
+
+
+@runtime_checkable
+class AdditivePreference(DietaryPreference, Protocol):
+    """Dietary preference whose cost only depends on per-recipe amounts.
+
+    Menus are scored by summing the `contribution` of each recipe and calling
+    `finalize` on the totals, which must give the same result as calling the
+    preference on the menu. Search engines use it to carry running totals
+    instead of walking every candidate menu again.
+
+    `finalize_bound` must never be higher than `finalize` of any totals between
+    `lower` and `upper` (element-wise).
+
+    Properties:
+    - dimensions: number of amounts each contribution holds.
+    """
+
+    dimensions: int
+
+    def contribution(self, recipe: Recipe) -> tuple[float, ...]: ...
+
+    def finalize(self, totals: Sequence[float]) -> float: ...
+
+    def finalize_bound(
+        self, lower: Sequence[float], upper: Sequence[float]
+    ) -> float: ...
+
+
+def sum_contributions(
+    preference: AdditivePreference, recipes: Iterable[Recipe]
+) -> list[float]:
+    totals = [0.0] * preference.dimensions
+    for recipe in recipes:
+        for i, amount in enumerate(preference.contribution(recipe)):
+            totals[i] += amount
+    return totals
+
+
+def additive_lower_bound(
+    preference: AdditivePreference,
+    recipes: Sequence[Recipe],
+    candidates: Sequence[Recipe],
+    size: int,
+) -> float:
+    """Lower bound (see `BoundedPreference`) for additive preferences.
+
+    Each remaining meal adds somewhere between the lowest and highest amount
+    any candidate provides.
+    """
+    totals = sum_contributions(preference, recipes)
+    remaining = size - len(recipes)
+    if remaining == 0:
+        return preference.finalize(totals)
+    if len(candidates) == 0:
+        return float("inf")
+    amounts = list(zip(*(preference.contribution(recipe) for recipe in candidates)))
+    return preference.finalize_bound(
+        [total + remaining * min(a) for total, a in zip(totals, amounts)],
+        [total + remaining * max(a) for total, a in zip(totals, amounts)],
+    )
+
+
+def _distance_to_range(target: float, lower: float, upper: float) -> float:
+    return max(lower - target, target - upper, 0)
+
+
 class RestrictIngredient(DietaryPreference):
     ingredient_id: IngredientId
+    dimensions = 1
 
     def __init__(self, ingredient_id: IngredientId):
         self.ingredient_id = ingredient_id
@@ -26,11 +122,27 @@ class RestrictIngredient(DietaryPreference):
                 return float("inf")
         return 0
 
+    def lower_bound(
+        self, recipes: Sequence[Recipe], candidates: Sequence[Recipe], size: int
+    ) -> float:
+        # Remaining meals may always avoid the ingredient, as far as we know.
+        return self(recipes)
+
+    def contribution(self, recipe: Recipe) -> tuple[float, ...]:
+        return (1.0 if recipe.contains(self.ingredient_id) else 0.0,)
+
+    def finalize(self, totals: Sequence[float]) -> float:
+        return float("inf") if totals[0] else 0
+
+    def finalize_bound(self, lower: Sequence[float], upper: Sequence[float]) -> float:
+        return self.finalize(lower)
+
 
 class MacroPreferences(DietaryPreference):
     carbohydrates: float
     proteins: float
     fats: float
+    dimensions = 3
 
     def __init__(self, carbohydrates: float, proteins: float, fats: float):
         self.carbohydrates = carbohydrates
@@ -38,30 +150,55 @@ class MacroPreferences(DietaryPreference):
         self.fats = fats
 
     def __call__(self, recipes: Iterable[Recipe]) -> float:
-        (total_carbohydrates, total_proteins, total_fats) = 0.0, 0.0, 0.0
-        for recipe in recipes:
-            (carbohydrates, proteins, fats) = recipe.macros_per_serving()
-            total_carbohydrates += carbohydrates
-            total_proteins += proteins
-            total_fats += fats
+        return self.finalize(sum_contributions(self, recipes))
+
+    def lower_bound(
+        self, recipes: Sequence[Recipe], candidates: Sequence[Recipe], size: int
+    ) -> float:
+        return additive_lower_bound(self, recipes, candidates, size)
+
+    def contribution(self, recipe: Recipe) -> tuple[float, ...]:
+        return recipe.macros_per_serving()
+
+    def finalize(self, totals: Sequence[float]) -> float:
+        (total_carbohydrates, total_proteins, total_fats) = totals
         return (
             abs(self.carbohydrates - total_carbohydrates)
             + abs(self.proteins - total_proteins)
             + abs(self.fats - total_fats)
         )
 
+    def finalize_bound(self, lower: Sequence[float], upper: Sequence[float]) -> float:
+        return (
+            _distance_to_range(self.carbohydrates, lower[0], upper[0])
+            + _distance_to_range(self.proteins, lower[1], upper[1])
+            + _distance_to_range(self.fats, lower[2], upper[2])
+        )
+
 
 class KilocaloriesPreferences(DietaryPreference):
     kilocalories: float
+    dimensions = 1
 
     def __init__(self, kilocalories: float):
         self.kilocalories = kilocalories
 
     def __call__(self, recipes: Iterable[Recipe]) -> float:
-        total_kilocalories = sum(
-            recipe.kilocalories_per_serving() for recipe in recipes
-        )
-        return abs(self.kilocalories - total_kilocalories)
+        return self.finalize(sum_contributions(self, recipes))
+
+    def lower_bound(
+        self, recipes: Sequence[Recipe], candidates: Sequence[Recipe], size: int
+    ) -> float:
+        return additive_lower_bound(self, recipes, candidates, size)
+
+    def contribution(self, recipe: Recipe) -> tuple[float, ...]:
+        return (recipe.kilocalories_per_serving(),)
+
+    def finalize(self, totals: Sequence[float]) -> float:
+        return abs(self.kilocalories - totals[0])
+
+    def finalize_bound(self, lower: Sequence[float], upper: Sequence[float]) -> float:
+        return _distance_to_range(self.kilocalories, lower[0], upper[0])
 
 
 class DietaryPreferenceCombination(DietaryPreference):
@@ -73,6 +210,23 @@ class DietaryPreferenceCombination(DietaryPreference):
     def __call__(self, recipes: Iterable[Recipe]) -> float:
         return sum(p(recipes) for p in self.preferences)
 
+    def lower_bound(
+        self, recipes: Sequence[Recipe], candidates: Sequence[Recipe], size: int
+    ) -> float:
+        return sum(
+            preference_lower_bound(p, recipes, candidates, size)
+            for p in self.preferences
+        )
+
+
+def restricted_ingredients(preference: DietaryPreference) -> set[IngredientId]:
+    """Returns ids of the ingredients `preference` forbids altogether."""
+    if isinstance(preference, RestrictIngredient):
+        return {preference.ingredient_id}
+    if isinstance(preference, DietaryPreferenceCombination):
+        return set().union(*(restricted_ingredients(p) for p in preference.preferences))
+    return set()
+
 
 @dataclass
 class DietaryPreferenceDTO:
@@ -1,5 +1,16 @@
-import json
+import itertools
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from collections.abc import Set as AbstractSet
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from typing import Any
+from uuid import UUID
 
 from create_recipes import (
     Ingredient,
@@ -7,10 +18,12 @@ from create_recipes import (
     MacroNutrients,
     Recipe,
     RecipeId,
+    IngredientNotFound,
     IngredientRepository,
     RecipeRepository,
 )
 from create_menu import Menu, MenuId, MenuRepository
+from catalogue import CatalogueRecordError, load_records, log_record_error
 
 
 def create_ingredient(ingredient_info: dict[str, Any]) -> Ingredient:
@@ -25,14 +38,54 @@ def create_ingredient(ingredient_info: dict[str, Any]) -> Ingredient:
     )
 
 
-def create_recipe(recipe_info: dict[str, Any]) -> Recipe:
+def ingredient_resolver(
+    ingredient_repository: IngredientRepository | None = None,
+) -> Callable[[IngredientId | dict[str, Any]], Ingredient]:
+    """Returns a function giving the ingredient a recipe record refers to.
+
+    Records either refer to ingredients by id (normalized format), looked up
+    in `ingredient_repository`, or embed them. Embedded ingredients are
+    replaced by the repository's instance if identical, and otherwise built
+    once per distinct record, so that recipes share instances either way.
+    Raises `IngredientNotFound` for unknown ids.
+    """
+    interned: dict[tuple[Any, ...], Ingredient] = {}
+
+    def resolve(ingredient_info: IngredientId | dict[str, Any]) -> Ingredient:
+        if isinstance(ingredient_info, str):
+            ingredient = None
+            if ingredient_repository is not None:
+                ingredient = ingredient_repository.find(ingredient_info)
+            if ingredient is None:
+                raise IngredientNotFound()
+            return ingredient
+        built = create_ingredient(ingredient_info)
+        key = (built.id, built.macronutrients, built.kilocalories)
+        if key not in interned:
+            known = None
+            if ingredient_repository is not None:
+                known = ingredient_repository.find(built.id)
+            interned[key] = known if known == built else built
+        return interned[key]
+
+    return resolve
+
+
+def create_recipe(
+    recipe_info: dict[str, Any],
+    find_ingredient: Callable[[Any], Ingredient] = create_ingredient,
+) -> Recipe:
+    """Builds a recipe from its record, ingredients from `find_ingredient`.
+
+    Ingredients are `[quantity, ingredient]` pairs, where the ingredient is
+    whatever `find_ingredient` takes: embedded by default, or see
+    `ingredient_resolver`.
+    """
     return Recipe(
         id=recipe_info["id"],
         name=recipe_info["name"],
         yield_=recipe_info["yield"],
-        ingredients=[
-            (i[0], create_ingredient(i[1])) for i in recipe_info["ingredients"]
-        ],
+        ingredients=[(i[0], find_ingredient(i[1])) for i in recipe_info["ingredients"]],
     )
 
 
@@ -41,24 +94,66 @@ class InMemoryIngredientRepository(IngredientRepository):
         self.ingredients = {i["id"]: create_ingredient(i) for i in ingredients}
 
     @staticmethod
-    def from_file(path: str) -> "InMemoryIngredientRepository":
-        with open(path) as f:
-            ingredients = json.loads(f.read())
-        return InMemoryIngredientRepository(ingredients)
+    def from_file(
+        path: str,
+        on_error: Callable[[CatalogueRecordError], object] = log_record_error,
+    ) -> "InMemoryIngredientRepository":
+        """Loads ingredients from a JSON array or NDJSON file, one at a time.
+
+        Invalid records are skipped, see `catalogue.load_records`.
+        """
+        repository = InMemoryIngredientRepository([])
+        for ingredient in load_records(path, create_ingredient, on_error):
+            repository.ingredients[ingredient.id] = ingredient
+        return repository
 
     def find(self, ingredient_id: IngredientId) -> Ingredient | None:
         return self.ingredients.get(ingredient_id)
 
 
 class InMemoryRecipeRepository(RecipeRepository):
-    def __init__(self, recipes: list[dict[str, Any]]):
-        self.recipes = {i["id"]: create_recipe(i) for i in recipes}
+    def __init__(
+        self,
+        recipes: list[dict[str, Any]],
+        ingredient_repository: IngredientRepository | None = None,
+    ):
+        """
+        Args:
+        - recipes: recipe records, ingredients embedded or referred to by id
+          (see `ingredient_resolver`).
+        - ingredient_repository: where ingredients are looked up, required
+          for records referring to them by id.
+        """
+        self.recipes: dict[str, Recipe] = {}
+        # Bumped on every change, so that results derived from the catalogue
+        # can tell they are stale.
+        self.catalogue_version = 0
+        # Inverted index: ingredient id -> ids of the recipes calling for it.
+        self.recipe_ids_by_ingredient: dict[IngredientId, set[RecipeId]] = {}
+        # Called with every recipe added, once the repository is up to date.
+        self.listeners: list[Callable[[Recipe], None]] = []
+        find_ingredient = ingredient_resolver(ingredient_repository)
+        for recipe_info in recipes:
+            self.add(create_recipe(recipe_info, find_ingredient))
 
     @staticmethod
-    def from_file(path: str) -> "InMemoryRecipeRepository":
-        with open(path) as f:
-            recipes = json.loads(f.read())
-        return InMemoryRecipeRepository(recipes)
+    def from_file(
+        path: str,
+        ingredient_repository: IngredientRepository | None = None,
+        on_error: Callable[[CatalogueRecordError], object] = log_record_error,
+    ) -> "InMemoryRecipeRepository":
+        """Loads recipes from a JSON array or NDJSON file, one at a time.
+
+        Invalid records, including those calling for unknown ingredients, are
+        skipped, see `catalogue.load_records`.
+        """
+        repository = InMemoryRecipeRepository([])
+        find_ingredient = ingredient_resolver(ingredient_repository)
+        for recipe in load_records(
+            path, lambda info: create_recipe(info, find_ingredient), on_error
+        ):
+            repository.add(recipe)
+        return repository
 
     def find(self, recipe_id: RecipeId) -> Recipe | None:
         return self.recipes.get(str(recipe_id))
@@ -67,7 +162,29 @@ class InMemoryRecipeRepository(RecipeRepository):
         return list(self.recipes.values())
 
     def add(self, recipe: Recipe):
+        replaced = self.recipes.get(str(recipe.id))
+        if replaced is not None:
+            for _, ingredient in replaced.ingredients:
+                self.recipe_ids_by_ingredient[ingredient.id].discard(replaced.id)
         self.recipes[str(recipe.id)] = recipe
+        self.catalogue_version += 1
+        for _, ingredient in recipe.ingredients:
+            self.recipe_ids_by_ingredient.setdefault(ingredient.id, set()).add(
+                recipe.id
+            )
+        for listener in self.listeners:
+            listener(recipe)
+
+    def subscribe(self, listener: Callable[[Recipe], None]):
+        self.listeners.append(listener)
+
+    def find_ids_by_ingredient(
+        self, ingredient_id: IngredientId
+    ) -> AbstractSet[RecipeId]:
+        return self.recipe_ids_by_ingredient.get(ingredient_id, frozenset())
+
+    def version(self) -> int:
+        return self.catalogue_version
 
 
 class InMemoryMenuRepository(MenuRepository):
@@ -79,3 +196,470 @@ class InMemoryMenuRepository(MenuRepository):
 
     def add(self, menu: Menu):
         self.menus[str(menu.id)] = menu
+
+
+def menu_footprint(menu: Menu) -> int:
+    """Returns approximate bytes `menu` holds, not counting recipes (shared)."""
+    return (
+        sys.getsizeof(menu)
+        + sys.getsizeof(menu.meals)
+        + sys.getsizeof(menu.alternatives)
+        + sum(menu_footprint(m) for m in menu.alternatives)
+    )
+
+
+@dataclass
+class MenuStoreStats:
+    """Counters of a `BoundedMenuRepository` since it was created.
+
+    Properties:
+    - hits: menus found in memory.
+    - misses: menus not found in memory, whether found spilled or not.
+    - spill_hits: menus not found in memory but found spilled.
+    - evictions: menus evicted to stay within bounds.
+    - expirations: menus evicted for not being read within the TTL.
+    - menus, bytes: menus held in memory and their approximate size.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    spill_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    menus: int = 0
+    bytes: int = 0
+
+
+class BoundedMenuRepository(MenuRepository):
+    """Menus held in memory within bounds, least recently used evicted first.
+
+    Evicted menus are added to `spill` if given (say, a
+    `SQLiteMenuRepository`), where they are then found.
+    """
+
+    def __init__(
+        self,
+        max_menus: int = 10_000,
+        max_bytes: int | None = None,
+        ttl: float | None = None,
+        spill: MenuRepository | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+        - max_menus, max_bytes: bounds of the menus held in memory, bytes as
+          estimated by `menu_footprint`.
+        - ttl: seconds after which menus not read nor added again are evicted.
+        - spill: where evicted menus are added.
+        """
+        self.max_menus = max_menus
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill = spill
+        self.clock = clock
+        # Menu id -> menu, footprint and last use, least recently used first.
+        self.menus: OrderedDict[str, tuple[Menu, int, float]] = OrderedDict()
+        self.counters = MenuStoreStats()
+        self.lock = threading.Lock()
+
+    def find(self, menu_id: MenuId) -> Menu | None:
+        key = str(menu_id)
+        with self.lock:
+            self._expire()
+            entry = self.menus.get(key)
+            if entry is not None:
+                self.counters.hits += 1
+                self.menus[key] = entry[0], entry[1], self.clock()
+                self.menus.move_to_end(key)
+                return entry[0]
+            self.counters.misses += 1
+        menu = None if self.spill is None else self.spill.find(menu_id)
+        if menu is not None:
+            with self.lock:
+                self.counters.spill_hits += 1
+        return menu
+
+    def add(self, menu: Menu):
+        key = str(menu.id)
+        footprint = menu_footprint(menu)
+        with self.lock:
+            replaced = self.menus.pop(key, None)
+            if replaced is not None:
+                self.counters.bytes -= replaced[1]
+            self.menus[key] = menu, footprint, self.clock()
+            self.counters.bytes += footprint
+            self._expire()
+            while len(self.menus) > self.max_menus or (
+                self.max_bytes is not None
+                and self.counters.bytes > self.max_bytes
+                and len(self.menus) > 1
+            ):
+                self._evict()
+                self.counters.evictions += 1
+            self.counters.menus = len(self.menus)
+
+    def stats(self) -> MenuStoreStats:
+        with self.lock:
+            return replace(self.counters)
+
+    def _expire(self):
+        # Least recently used first, so expired menus are at the front.
+        now = self.clock()
+        while (
+            self.ttl is not None
+            and self.menus
+            and now - next(iter(self.menus.values()))[2] > self.ttl
+        ):
+            self._evict()
+            self.counters.expirations += 1
+        self.counters.menus = len(self.menus)
+
+    def _evict(self):
+        _, (menu, footprint, _) = self.menus.popitem(last=False)
+        self.counters.bytes -= footprint
+        # Under the lock, so that a menu is never missing from both.
+        if self.spill is not None:
+            self.spill.add(menu)
+
+
+class SQLiteConnectionPool:
+    """Connections to a SQLite database file, shared by threads.
+
+    Connections are in WAL mode, so that reads don't wait for writes (nor the
+    other way around), and are used by one thread at a time: `connection()`
+    blocks until one is free.
+    """
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 5):
+        """
+        Args:
+        - path: database file, created if missing.
+        - size: number of connections, that is of concurrent transactions.
+        - timeout: seconds a write waits for another one to finish.
+        """
+        self.connections: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Safe with WAL: a crash may lose the last commits, not corrupt.
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self.connections.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connections.get()
+        try:
+            yield connection
+        finally:
+            self.connections.put(connection)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Yields a connection, commits once done (rolls back on errors)."""
+        with self.connection() as connection, connection:
+            yield connection
+
+    def close(self):
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+def _ingredient_from_row(row: tuple[Any, ...]) -> Ingredient:
+    ingredient_id, carbohydrates, proteins, fats, kilocalories = row
+    return Ingredient(
+        id=ingredient_id,
+        macronutrients=MacroNutrients(carbohydrates, proteins, fats),
+        kilocalories=kilocalories,
+    )
+
+
+def _ingredient_row(ingredient: Ingredient) -> tuple[Any, ...]:
+    return (ingredient.id, *ingredient.macronutrients, ingredient.kilocalories)
+
+
+class SQLiteIngredientRepository(IngredientRepository):
+    def __init__(self, pool: SQLiteConnectionPool):
+        self.pool = pool
+        with pool.transaction() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingredients (
+                    id TEXT PRIMARY KEY,
+                    carbohydrates REAL,
+                    proteins REAL,
+                    fats REAL,
+                    kilocalories REAL
+                )
+                """
+            )
+
+    def find(self, ingredient_id: IngredientId) -> Ingredient | None:
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT id, carbohydrates, proteins, fats, kilocalories"
+                " FROM ingredients WHERE id = ?",
+                (ingredient_id,),
+            ).fetchone()
+        return None if row is None else _ingredient_from_row(row)
+
+    def add(self, *ingredients: Ingredient):
+        with self.pool.transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO ingredients VALUES (?, ?, ?, ?, ?)",
+                map(_ingredient_row, ingredients),
+            )
+
+    def count(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT count(*) FROM ingredients").fetchone()[0]
+
+
+class SQLiteRecipeRepository(RecipeRepository):
+    """Recipes stored in SQLite, in the order they were first added.
+
+    Recipes keep their own copy of ingredients' nutrition (like embedded
+    records), so that later changes to the ingredient catalogue don't alter
+    them. `all()` is rebuilt from a single streamed query whenever the
+    catalogue version changed, and shared until it changes again.
+    """
+
+    def __init__(self, pool: SQLiteConnectionPool):
+        self.pool = pool
+        # Called with every recipe added, once the repository is up to date.
+        # Only recipes added through this instance are notified.
+        self.listeners: list[Callable[[Recipe], None]] = []
+        self.lock = threading.Lock()
+        self.cached: tuple[int, list[Recipe]] | None = None
+        with pool.transaction() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS recipes (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    yield INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                    recipe_id TEXT NOT NULL REFERENCES recipes (id),
+                    position INTEGER NOT NULL,
+                    quantity REAL NOT NULL,
+                    ingredient_id TEXT NOT NULL,
+                    carbohydrates REAL,
+                    proteins REAL,
+                    fats REAL,
+                    kilocalories REAL,
+                    PRIMARY KEY (recipe_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS recipe_ingredients_by_ingredient
+                    ON recipe_ingredients (ingredient_id);
+                -- Single row, bumped on every change, so that results derived
+                -- from the catalogue can tell they are stale.
+                CREATE TABLE IF NOT EXISTS catalogue_version (version INTEGER);
+                INSERT INTO catalogue_version
+                    SELECT 0 WHERE NOT EXISTS (SELECT * FROM catalogue_version);
+                """
+            )
+
+    def find(self, recipe_id: RecipeId) -> Recipe | None:
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                self._select("WHERE r.id = ? ORDER BY i.position"), (str(recipe_id),)
+            ).fetchall()
+        return next(self._recipes_from_rows(rows), None)
+
+    def all(self) -> list[Recipe]:
+        with self.lock:
+            version = self.version()
+            if self.cached is None or self.cached[0] != version:
+                self.cached = version, list(self.iter_all())
+            return list(self.cached[1])
+
+    def iter_all(self) -> Iterator[Recipe]:
+        """Yields all recipes as rows are read, without caching them."""
+        # Reads within a transaction, so that concurrent writes aren't seen.
+        with self.pool.connection() as connection, connection:
+            connection.execute("BEGIN")
+            rows = connection.execute(self._select("ORDER BY r.rowid, i.position"))
+            yield from self._recipes_from_rows(rows)
+
+    def add(self, recipe: Recipe):
+        recipe_id = str(recipe.id)
+        with self.pool.transaction() as connection:
+            # Upsert rather than replace, keeping the rowid and thus the order.
+            connection.execute(
+                "INSERT INTO recipes (id, name, yield) VALUES (?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE"
+                " SET name = excluded.name, yield = excluded.yield",
+                (recipe_id, recipe.name, recipe.yield_),
+            )
+            connection.execute(
+                "DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,)
+            )
+            connection.executemany(
+                "INSERT INTO recipe_ingredients VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (recipe_id, position, quantity, *_ingredient_row(ingredient))
+                    for position, (quantity, ingredient) in enumerate(
+                        recipe.ingredients
+                    )
+                ),
+            )
+            connection.execute("UPDATE catalogue_version SET version = version + 1")
+        for listener in self.listeners:
+            listener(recipe)
+
+    def subscribe(self, listener: Callable[[Recipe], None]):
+        self.listeners.append(listener)
+
+    def find_ids_by_ingredient(
+        self, ingredient_id: IngredientId
+    ) -> AbstractSet[RecipeId]:
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT recipe_id FROM recipe_ingredients"
+                " WHERE ingredient_id = ?",
+                (ingredient_id,),
+            )
+            return frozenset(UUID(row[0]) for row in rows)
+
+    def version(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute(
+                "SELECT version FROM catalogue_version"
+            ).fetchone()[0]
+
+    @staticmethod
+    def _select(clause: str) -> str:
+        return (
+            "SELECT r.id, r.name, r.yield, i.quantity, i.ingredient_id,"
+            " i.carbohydrates, i.proteins, i.fats, i.kilocalories"
+            " FROM recipes r LEFT JOIN recipe_ingredients i ON i.recipe_id = r.id "
+            + clause
+        )
+
+    @staticmethod
+    def _recipes_from_rows(rows: Iterator[Any] | list[Any]) -> Iterator[Recipe]:
+        """Yields recipes from rows of `_select`, grouped by recipe."""
+        interned: dict[tuple[Any, ...], Ingredient] = {}
+        for (recipe_id, name, yield_), group in itertools.groupby(
+            rows, key=lambda row: row[:3]
+        ):
+            ingredients = []
+            for row in group:
+                if row[3] is None:  # No ingredients, joined with nulls.
+                    continue
+                if row[4:] not in interned:
+                    interned[row[4:]] = _ingredient_from_row(row[4:])
+                ingredients.append((row[3], interned[row[4:]]))
+            yield Recipe(
+                id=UUID(recipe_id), name=name, ingredients=ingredients, yield_=yield_
+            )
+
+
+class SQLiteMenuRepository(MenuRepository):
+    """Menus stored in SQLite, meals referring to recipes by id.
+
+    Meals are read from `recipe_repository`, as they are now.
+    """
+
+    def __init__(self, pool: SQLiteConnectionPool, recipe_repository: RecipeRepository):
+        self.pool = pool
+        self.recipe_repository = recipe_repository
+        with pool.transaction() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS menus (
+                    id TEXT PRIMARY KEY,
+                    cost REAL,
+                    optimality_gap REAL
+                );
+                CREATE TABLE IF NOT EXISTS menu_meals (
+                    menu_id TEXT NOT NULL REFERENCES menus (id),
+                    position INTEGER NOT NULL,
+                    recipe_id TEXT NOT NULL,
+                    PRIMARY KEY (menu_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS menu_alternatives (
+                    menu_id TEXT NOT NULL REFERENCES menus (id),
+                    position INTEGER NOT NULL,
+                    alternative_id TEXT NOT NULL,
+                    PRIMARY KEY (menu_id, position)
+                );
+                """
+            )
+
+    def find(self, menu_id: MenuId) -> Menu | None:
+        # Rows are read before recipes are, not to hold two connections.
+        with self.pool.connection() as connection:
+            row = self._read(connection, str(menu_id))
+            if row is None:
+                return None
+            alternative_rows = [
+                self._read(connection, alternative_id) for alternative_id in row[3]
+            ]
+        menu = self._menu_from_row(row)
+        menu.alternatives = [
+            self._menu_from_row(r) for r in alternative_rows if r is not None
+        ]
+        return menu
+
+    def add(self, menu: Menu):
+        """Adds `menu`, and its alternatives so that they are found with it."""
+        with self.pool.transaction() as connection:
+            for alternative in menu.alternatives:
+                self._write(connection, alternative, alternatives=False)
+            self._write(connection, menu)
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, menu: Menu, alternatives=True):
+        menu_id = str(menu.id)
+        connection.execute(
+            "INSERT OR REPLACE INTO menus VALUES (?, ?, ?)",
+            (menu_id, menu.cost, menu.optimality_gap),
+        )
+        connection.execute("DELETE FROM menu_meals WHERE menu_id = ?", (menu_id,))
+        connection.executemany(
+            "INSERT INTO menu_meals VALUES (?, ?, ?)",
+            ((menu_id, i, str(m.id)) for i, m in enumerate(menu.meals)),
+        )
+        if alternatives:
+            connection.execute(
+                "DELETE FROM menu_alternatives WHERE menu_id = ?", (menu_id,)
+            )
+            connection.executemany(
+                "INSERT INTO menu_alternatives VALUES (?, ?, ?)",
+                ((menu_id, i, str(m.id)) for i, m in enumerate(menu.alternatives)),
+            )
+
+    @staticmethod
+    def _read(connection: sqlite3.Connection, menu_id: str) -> tuple[Any, ...] | None:
+        """Returns menu's id, cost, optimality gap, alternative ids and meal ids."""
+        row = connection.execute(
+            "SELECT cost, optimality_gap FROM menus WHERE id = ?", (menu_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        meal_ids = connection.execute(
+            "SELECT recipe_id FROM menu_meals WHERE menu_id = ? ORDER BY position",
+            (menu_id,),
+        ).fetchall()
+        alternative_ids = connection.execute(
+            "SELECT alternative_id FROM menu_alternatives"
+            " WHERE menu_id = ? ORDER BY position",
+            (menu_id,),
+        ).fetchall()
+        return (
+            menu_id,
+            *row,
+            [a for (a,) in alternative_ids],
+            [m for (m,) in meal_ids],
+        )
+
+    def _menu_from_row(self, row: tuple[Any, ...]) -> Menu:
+        menu_id, cost, optimality_gap, _, meal_ids = row
+        meals = [self.recipe_repository.find(UUID(m)) for m in meal_ids]
+        return Menu(
+            id=UUID(menu_id),
+            meals=[m for m in meals if m is not None],
+            cost=cost,
+            optimality_gap=optimality_gap,
+        )
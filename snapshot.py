@@ -0,0 +1,353 @@
+"""Binary snapshot of the catalogue, memory-mapped by workers.
+
+Layout (little-endian), sections aligned to 8 bytes:
+- header: `HEADER`.
+- ingredients: `INGREDIENT` rows. The first ones are the catalogue's, the
+  others ingredients recipes embed that differ from the catalogue's.
+- recipes: `RECIPE` rows, in catalogue order.
+- recipe ingredients: `RECIPE_INGREDIENT` rows, by recipe.
+- strings: UTF-8 ids and names, referred to by (offset, length).
+
+Missing nutrients are stored as NaN.
+"""
+
+import argparse
+import math
+import mmap
+import os
+import struct
+from collections.abc import Callable, Iterable
+from collections.abc import Set as AbstractSet
+from uuid import UUID
+
+import numpy as np
+
+from create_recipes import (
+    Ingredient,
+    IngredientId,
+    IngredientRepository,
+    MacroNutrients,
+    Recipe,
+    RecipeId,
+    RecipeRepository,
+)
+from repositories import InMemoryIngredientRepository, InMemoryRecipeRepository
+
+MAGIC = b"MPSNAP\0\0"
+FORMAT_VERSION = 1
+# Magic, format version, catalogue ingredients, ingredients, recipes, recipe
+# ingredients, string table size.
+HEADER = struct.Struct("<8sIIIIQQ")
+# Nutrition columns: carbohydrates, proteins, fats (grams) and kilocalories,
+# per 100 gram for ingredients and per serving for recipes.
+INGREDIENT = np.dtype([("nutrition", "<f8", 4), ("id", "<u4"), ("id_length", "<u4")])
+RECIPE = np.dtype(
+    [
+        ("nutrition", "<f8", 4),
+        ("id", "V16"),
+        ("name", "<u4"),
+        ("name_length", "<u4"),
+        ("yield", "<i4"),
+        ("ingredient_count", "<u4"),
+        ("first_ingredient", "<u8"),
+    ]
+)
+RECIPE_INGREDIENT = np.dtype([("quantity", "<f8"), ("ingredient", "<u4")])
+
+
+class SnapshotNotValid(ValueError):
+    pass
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def _nutrient(value: float | None) -> float:
+    return math.nan if value is None else value
+
+
+def export_snapshot(
+    path: str, ingredients: Iterable[Ingredient], recipes: Iterable[Recipe]
+):
+    """Writes catalogue snapshot to `path`, replacing it atomically.
+
+    Args:
+    - ingredients: ingredient catalogue, looked up by id once loaded.
+    - recipes: recipes, whose ids must be UUIDs.
+    """
+    strings = bytearray()
+    string_positions: dict[str, tuple[int, int]] = {}
+
+    def string(value: str) -> tuple[int, int]:
+        if value not in string_positions:
+            encoded = value.encode()
+            string_positions[value] = len(strings), len(encoded)
+            strings.extend(encoded)
+        return string_positions[value]
+
+    ingredient_rows: list[tuple] = []
+    ingredient_positions: dict[tuple, int] = {}
+
+    def ingredient_position(ingredient: Ingredient) -> int:
+        key = (ingredient.id, ingredient.macronutrients, ingredient.kilocalories)
+        if key not in ingredient_positions:
+            ingredient_positions[key] = len(ingredient_rows)
+            nutrition = (*ingredient.macronutrients, ingredient.kilocalories)
+            ingredient_rows.append(
+                (tuple(map(_nutrient, nutrition)), *string(ingredient.id))
+            )
+        return ingredient_positions[key]
+
+    for ingredient in ingredients:
+        ingredient_position(ingredient)
+    catalogue_ingredients = len(ingredient_rows)
+    recipe_rows: list[tuple] = []
+    recipe_ingredient_rows: list[tuple[float, int]] = []
+    for recipe in recipes:
+        recipe_rows.append(
+            (
+                (*recipe.macros_per_serving(), recipe.kilocalories_per_serving()),
+                UUID(str(recipe.id)).bytes,
+                *string(recipe.name),
+                recipe.yield_,
+                len(recipe.ingredients),
+                len(recipe_ingredient_rows),
+            )
+        )
+        recipe_ingredient_rows.extend(
+            (quantity, ingredient_position(ingredient))
+            for quantity, ingredient in recipe.ingredients
+        )
+
+    sections = [
+        np.array(ingredient_rows, dtype=INGREDIENT).tobytes(),
+        np.array(recipe_rows, dtype=RECIPE).tobytes(),
+        np.array(recipe_ingredient_rows, dtype=RECIPE_INGREDIENT).tobytes(),
+        bytes(strings),
+    ]
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        catalogue_ingredients,
+        len(ingredient_rows),
+        len(recipe_rows),
+        len(recipe_ingredient_rows),
+        len(strings),
+    )
+    # Written aside then renamed, so that workers mapping the previous
+    # snapshot keep reading it unchanged.
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(header)
+        for section in sections:
+            f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+            f.write(section)
+    os.replace(temporary, path)
+
+
+class CatalogueSnapshot:
+    """Catalogue snapshot, memory-mapped read-only.
+
+    Pages are shared by all processes mapping the same file. Ingredients and
+    recipes are only built when asked for; ingredients are then kept, so that
+    recipes share them.
+
+    Properties:
+    - nutrition: (recipes, 4) array of per-serving carbohydrates, proteins,
+      fats and kilocalories, read from the file, which recipes are built
+      with rather than computing it again.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < HEADER.size:
+            raise SnapshotNotValid(f"{path} is not a catalogue snapshot")
+        (
+            magic,
+            format_version,
+            self.catalogue_ingredients,
+            ingredient_count,
+            recipe_count,
+            recipe_ingredient_count,
+            strings_size,
+        ) = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise SnapshotNotValid(f"{path} is not a catalogue snapshot")
+        offset = HEADER.size
+        arrays = []
+        for dtype, count in [
+            (INGREDIENT, ingredient_count),
+            (RECIPE, recipe_count),
+            (RECIPE_INGREDIENT, recipe_ingredient_count),
+        ]:
+            offset = _aligned(offset)
+            arrays.append(np.frombuffer(self.mmap, dtype, count, offset))
+            offset += dtype.itemsize * count
+        self.ingredient_rows, self.recipe_rows, self.recipe_ingredient_rows = arrays
+        offset = _aligned(offset)
+        self.strings = memoryview(self.mmap)[offset : offset + strings_size]
+        self.nutrition = self.recipe_rows["nutrition"]
+        self.ingredients: list[Ingredient | None] = [None] * ingredient_count
+
+    def __len__(self) -> int:
+        return len(self.recipe_rows)
+
+    def ingredient(self, position: int) -> Ingredient:
+        ingredient = self.ingredients[position]
+        if ingredient is None:
+            row = self.ingredient_rows[position]
+            nutrition = [None if math.isnan(v) else float(v) for v in row["nutrition"]]
+            ingredient = self.ingredients[position] = Ingredient(
+                id=self.ingredient_id(position),
+                macronutrients=MacroNutrients(*nutrition[:3]),  # type: ignore[arg-type]
+                kilocalories=nutrition[3],  # type: ignore[arg-type]
+            )
+        return ingredient
+
+    def ingredient_id(self, position: int) -> IngredientId:
+        row = self.ingredient_rows[position]
+        return self._string(row["id"], row["id_length"])
+
+    def recipe(self, position: int) -> Recipe:
+        row = self.recipe_rows[position]
+        first = int(row["first_ingredient"])
+        ingredients = self.recipe_ingredient_rows[
+            first : first + row["ingredient_count"]
+        ]
+        *macros, kilocalories = self.nutrition[position].tolist()
+        return Recipe(
+            id=self.recipe_id(position),
+            name=self._string(row["name"], row["name_length"]),
+            ingredients=[
+                (float(quantity), self.ingredient(int(ingredient)))
+                for quantity, ingredient in ingredients.tolist()
+            ],
+            yield_=int(row["yield"]),
+            per_serving=(MacroNutrients(*macros), kilocalories),
+        )
+
+    def recipe_id(self, position: int) -> RecipeId:
+        return UUID(bytes=bytes(self.recipe_rows[position]["id"]))
+
+    def recipe_ingredient_ids(self, position: int) -> list[IngredientId]:
+        """Returns ids of ingredients recipe calls for, without building it."""
+        row = self.recipe_rows[position]
+        first = int(row["first_ingredient"])
+        ingredients = self.recipe_ingredient_rows["ingredient"][
+            first : first + row["ingredient_count"]
+        ]
+        return [self.ingredient_id(int(i)) for i in ingredients]
+
+    def _string(self, offset: int, length: int) -> str:
+        return bytes(self.strings[offset : offset + length]).decode()
+
+
+class SnapshotIngredientRepository(IngredientRepository):
+    def __init__(self, snapshot: CatalogueSnapshot):
+        self.snapshot = snapshot
+        self.positions = {
+            snapshot.ingredient_id(i): i for i in range(snapshot.catalogue_ingredients)
+        }
+
+    def find(self, ingredient_id: IngredientId) -> Ingredient | None:
+        position = self.positions.get(ingredient_id)
+        return None if position is None else self.snapshot.ingredient(position)
+
+
+class SnapshotRecipeRepository(RecipeRepository):
+    """Recipes of a snapshot, followed by those added since it was loaded.
+
+    Snapshot recipes are built on first access and then kept. Added recipes
+    are only kept in memory.
+    """
+
+    def __init__(self, snapshot: CatalogueSnapshot):
+        self.snapshot = snapshot
+        # Snapshot recipes not built yet are None.
+        self.recipes: list[Recipe | None] = [None] * len(snapshot)
+        self.positions = {str(snapshot.recipe_id(i)): i for i in range(len(snapshot))}
+        # Bumped on every change, so that results derived from the catalogue
+        # can tell they are stale.
+        self.catalogue_version = 0
+        # Inverted index: ingredient id -> ids of the recipes calling for it,
+        # built on first use.
+        self.recipe_ids_by_ingredient: dict[IngredientId, set[RecipeId]] | None = None
+        # Called with every recipe added, once the repository is up to date.
+        self.listeners: list[Callable[[Recipe], None]] = []
+
+    def find(self, recipe_id: RecipeId) -> Recipe | None:
+        position = self.positions.get(str(recipe_id))
+        return None if position is None else self._recipe(position)
+
+    def all(self) -> list[Recipe]:
+        return [self._recipe(i) for i in range(len(self.recipes))]
+
+    def add(self, recipe: Recipe):
+        position = self.positions.get(str(recipe.id))
+        if position is None:
+            self.positions[str(recipe.id)] = len(self.recipes)
+            self.recipes.append(recipe)
+        else:
+            replaced = self._recipe(position)
+            if self.recipe_ids_by_ingredient is not None:
+                for _, ingredient in replaced.ingredients:
+                    self.recipe_ids_by_ingredient[ingredient.id].discard(replaced.id)
+            self.recipes[position] = recipe
+        self.catalogue_version += 1
+        if self.recipe_ids_by_ingredient is not None:
+            for _, ingredient in recipe.ingredients:
+                self.recipe_ids_by_ingredient.setdefault(ingredient.id, set()).add(
+                    recipe.id
+                )
+        for listener in self.listeners:
+            listener(recipe)
+
+    def subscribe(self, listener: Callable[[Recipe], None]):
+        self.listeners.append(listener)
+
+    def find_ids_by_ingredient(
+        self, ingredient_id: IngredientId
+    ) -> AbstractSet[RecipeId]:
+        if self.recipe_ids_by_ingredient is None:
+            index: dict[IngredientId, set[RecipeId]] = {}
+            for position, recipe in enumerate(self.recipes):
+                if recipe is None:
+                    recipe_id = self.snapshot.recipe_id(position)
+                    ingredient_ids = self.snapshot.recipe_ingredient_ids(position)
+                else:
+                    recipe_id = recipe.id
+                    ingredient_ids = [i.id for _, i in recipe.ingredients]
+                for i in ingredient_ids:
+                    index.setdefault(i, set()).add(recipe_id)
+            self.recipe_ids_by_ingredient = index
+        return self.recipe_ids_by_ingredient.get(ingredient_id, frozenset())
+
+    def version(self) -> int:
+        return self.catalogue_version
+
+    def _recipe(self, position: int) -> Recipe:
+        recipe = self.recipes[position]
+        if recipe is None:
+            recipe = self.recipes[position] = self.snapshot.recipe(position)
+        return recipe
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exports catalogue files to a snapshot loaded by workers."
+    )
+    parser.add_argument("ingredients", help="ingredients file, JSON array or NDJSON")
+    parser.add_argument("recipes", help="recipes file, JSON array or NDJSON")
+    parser.add_argument("snapshot", help="snapshot file to write")
+    args = parser.parse_args()
+    ingredient_repo = InMemoryIngredientRepository.from_file(args.ingredients)
+    recipe_repo = InMemoryRecipeRepository.from_file(args.recipes, ingredient_repo)
+    export_snapshot(
+        args.snapshot, ingredient_repo.ingredients.values(), recipe_repo.all()
+    )
+
+
+if __name__ == "__main__":
+    main()
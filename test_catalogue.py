@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from catalogue import CatalogueRecordError, iter_records, load_records
+from repositories import (
+    InMemoryIngredientRepository,
+    InMemoryRecipeRepository,
+    create_ingredient,
+)
+
+onions = {
+    "id": "onions",
+    "macronutrients": {"carbohydrates": 9.3, "proteins": 1.1, "fats": 0.1},
+    "kilocalories": 40,
+}
+garlic = {
+    "id": "garlic",
+    "macronutrients": {"carbohydrates": 33.1, "proteins": 6.4, "fats": 0.5},
+    "kilocalories": 149,
+}
+
+
+class IterRecordsTestCase(unittest.TestCase):
+    def records(self, text, chunk_size=4):
+        return list(iter_records(io.StringIO(text), chunk_size=chunk_size))
+
+    def test_array(self):
+        text = json.dumps([onions, garlic, [1, "a,]"], 12345], indent=2)
+
+        self.assertEqual(
+            self.records(text),
+            [(2, onions), (11, garlic), (20, [1, "a,]"]), (24, 12345)],
+        )
+
+    def test_array_read_at_once(self):
+        text = json.dumps([onions, garlic], indent=2)
+
+        self.assertEqual(self.records(text, chunk_size=1 << 16), self.records(text))
+
+    def test_empty_array(self):
+        self.assertEqual(self.records(" [ \n ] "), [])
+
+    def test_ndjson(self):
+        text = f"{json.dumps(onions)}\n\n{json.dumps(garlic)}\n"
+
+        self.assertEqual(self.records(text), [(1, onions), (3, garlic)])
+
+    def test_invalid_ndjson_line(self):
+        (_, first), (_, error), (_, last) = self.records(
+            f"{json.dumps(onions)}\n{{oops\n{json.dumps(garlic)}"
+        )
+
+        self.assertEqual((first, last), (onions, garlic))
+        self.assertIsInstance(error, CatalogueRecordError)
+        self.assertEqual(error.line, 2)
+
+    def test_invalid_array(self):
+        for text in ['[{"a": 1}\n {"b": 2}]', '[{"a": 1},\n {"b": ]', '[{"a": 1}']:
+            with self.subTest(text=text):
+                with self.assertRaises(CatalogueRecordError) as raised:
+                    self.records(text)
+                self.assertEqual(raised.exception.line, text.count("\n") + 1)
+
+
+class LoadRecordsTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "ingredients.json")
+
+    def test_invalid_records_skipped(self):
+        with open(self.path, "w") as f:
+            json.dump([onions, {"id": "garlic"}, garlic], f, indent=0)
+        errors = []
+
+        ingredients = list(load_records(self.path, create_ingredient, errors.append))
+
+        self.assertEqual([i.id for i in ingredients], ["onions", "garlic"])
+        (error,) = errors
+        self.assertEqual(error.line, 11)
+        self.assertIn("macronutrients", error.message)
+
+    def test_recipes_with_unknown_ingredients_skipped(self):
+        recipe = {"id": "1", "name": "onions", "yield": 1, "ingredients": []}
+        with open(self.path, "w") as f:
+            f.writelines(
+                json.dumps(recipe | {"ingredients": ingredients}) + "\n"
+                for ingredients in [[[100, "onions"]], [[100, "garlic"]]]
+            )
+        errors = []
+
+        repository = InMemoryRecipeRepository.from_file(
+            self.path,
+            InMemoryIngredientRepository([onions]),
+            on_error=errors.append,
+        )
+
+        self.assertEqual(len(repository.all()), 1)
+        self.assertEqual([e.line for e in errors], [2])
+
+    def test_data_files(self):
+        for path in ["data/ingredients.json", "data/recipes.json"]:
+            with self.subTest(path=path), open(path) as f:
+                records = [record for _, record in iter_records(f)]
+                f.seek(0)
+                self.assertEqual(records, json.load(f))
@@ -1,13 +1,43 @@
+import threading
+import time
 import unittest
 from unittest import mock
 
 from create_menu import (
+    MenuEstimate,
+    MenuSearchTooExpensive,
+    estimate_menu_search,
+    SearchCancelled,
+    SearchMonitor,
+    SearchProgress,
+    monitored,
+    MenuRequestDTO,
+    select_menus_branch_and_bound,
+    select_menus_collapsed,
+    MenuSumIndex,
+    Menu,
+    MenuCache,
+    MenuScorer,
+    menu_request_key,
     select_recipes_brute_force,
+    select_recipes_branch_and_bound,
+    select_recipes_vectorized,
+    select_recipes_local_search,
+    menu_lower_bound,
+    equivalent_recipe_representatives,
+    select_recipes_collapsed,
+    select_recipes_meet_in_the_middle,
     CreateMenuUseCase,
+    DietaryPreferenceDTO,
     DietaryPreferenceNotValid,
     MenuRepository,
     CannotCreateMenu,
 )
+from preferences import (
+    DietaryPreferenceCombination,
+    KilocaloriesPreferences,
+    MacroPreferences,
+)
 from create_recipes import (
     Recipe,
     RecipeRepository,
@@ -144,6 +174,506 @@ class BruteForceTestCase(unittest.TestCase):
         self.assertTrue(menu[0] == recipes[1])
 
 
+class BranchAndBoundTestCase(unittest.TestCase):
+    def test_invalid_size_raises_error(self):
+        self.assertRaises(ValueError, select_recipes_branch_and_bound, [test_recipe], 0)
+
+    def test_empty_recipes_raises_error(self):
+        self.assertRaises(ValueError, select_recipes_branch_and_bound, [], 1)
+
+    def test_single_recipe_size_3(self):
+        menu = select_recipes_branch_and_bound([test_recipe], 3)
+
+        self.assertEqual(menu, [test_recipe, test_recipe, test_recipe])
+
+    def test_draw_returns_first_tested_combination(self):
+        other_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="other",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+        recipes = [other_recipe, test_recipe]
+
+        menu = select_recipes_branch_and_bound(recipes, 2, lambda menu: 0)
+
+        self.assertEqual(menu, select_recipes_brute_force(recipes, 2))
+
+    def test_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+
+        with monitored(SearchMonitor(cancelled)):
+            self.assertRaises(
+                SearchCancelled, select_recipes_branch_and_bound, [test_recipe], 3
+            )
+
+    def test_including_recipe_not_given_raises_error(self):
+        self.assertRaises(
+            ValueError,
+            select_menus_branch_and_bound,
+            [test_recipe],
+            1,
+            including=mock.sentinel.recipe,
+        )
+
+    def test_preference_without_bound(self):
+        def prefer_test_recipe(menu):
+            return sum(recipe is not test_recipe for recipe in menu)
+
+        other_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="other",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+
+        menu = select_recipes_branch_and_bound(
+            [other_recipe, test_recipe], 3, prefer_test_recipe
+        )
+
+        self.assertEqual(menu, [test_recipe, test_recipe, test_recipe])
+
+
+class VectorizedTestCase(unittest.TestCase):
+    def test_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+
+        with monitored(SearchMonitor(cancelled)):
+            self.assertRaises(
+                SearchCancelled, select_recipes_vectorized, [test_recipe], 1
+            )
+
+    def test_invalid_chunk_size_raises_error(self):
+        self.assertRaises(
+            ValueError, select_recipes_vectorized, [test_recipe], 1, chunk_size=0
+        )
+
+    def test_draw_across_chunks_returns_first_tested_combination(self):
+        other_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="other",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+
+        menu = select_recipes_vectorized(
+            [other_recipe, test_recipe], 2, lambda menu: 0, chunk_size=1
+        )
+
+        self.assertEqual(menu, [other_recipe, other_recipe])
+
+
+class LocalSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        bread = Ingredient(
+            id="bread",
+            macronutrients=MacroNutrients(carbohydrates=50, proteins=10, fats=5),
+            kilocalories=250,
+        )
+        self.recipes = [
+            Recipe(
+                id=RecipeId(int=i),
+                name=f"bread {i}",
+                ingredients=[(10 * i, bread)],
+                yield_=1,
+            )
+            for i in range(1, 15)
+        ]
+        self.preferences = KilocaloriesPreferences(230)
+
+    def test_invalid_size_raises_error(self):
+        self.assertRaises(ValueError, select_recipes_local_search, [test_recipe], 0)
+
+    def test_finds_best_menu_on_small_catalogue(self):
+        menu = select_recipes_local_search(
+            self.recipes, 3, self.preferences, time_limit=0.2, seed=0
+        )
+
+        self.assertEqual(
+            self.preferences(menu),
+            self.preferences(
+                select_recipes_branch_and_bound(self.recipes, 3, self.preferences)
+            ),
+        )
+
+    def test_no_time_left_returns_a_menu(self):
+        menu = select_recipes_local_search(
+            self.recipes, 3, self.preferences, time_limit=0
+        )
+
+        self.assertEqual(len(menu), 3)
+
+    def test_greedy_menu_stops_at_time_limit(self):
+        recipes = self.recipes * 100
+
+        with mock.patch.object(
+            MenuScorer, "lower_bound", autospec=True, side_effect=MenuScorer.lower_bound
+        ) as lower_bound:
+            menu = select_recipes_local_search(
+                recipes, 3, self.preferences, time_limit=0
+            )
+
+        self.assertEqual(len(menu), 3)
+        # The bound of the empty menu, then 63 recipes for the first meal.
+        self.assertEqual(lower_bound.call_count, 1 + 63)
+        self.assertEqual(menu, [menu[0]] * 3)
+
+    def test_greedy_menu_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+
+        with (
+            monitored(SearchMonitor(cancelled)),
+            mock.patch.object(
+                MenuScorer,
+                "lower_bound",
+                autospec=True,
+                side_effect=MenuScorer.lower_bound,
+            ) as lower_bound,
+        ):
+            self.assertRaises(
+                SearchCancelled,
+                select_recipes_local_search,
+                self.recipes * 100,
+                1000,
+                self.preferences,
+            )
+        self.assertEqual(lower_bound.call_count, 1 + 63)
+
+    def test_swapped_meal_totals(self):
+        scorer = MenuScorer(self.recipes, 2, self.preferences)
+        totals = scorer.add(scorer.add(scorer.initial_totals(), 0), 1)
+
+        swapped = scorer.replace(totals, 1, 2)
+
+        expected = scorer.add(scorer.add(scorer.initial_totals(), 0), 2)
+        for total, expected_total in zip(swapped, expected, strict=True):
+            self.assertAlmostEqual(total, expected_total)
+
+    def test_lower_bound(self):
+        # Three of the biggest breads are 1050 kcal, far from 2000.
+        bound = menu_lower_bound(self.recipes, 3, KilocaloriesPreferences(2000))
+
+        self.assertAlmostEqual(bound, 2000 - 3 * 140 * 2.5)
+
+
+class CollapsedTestCase(unittest.TestCase):
+    def setUp(self):
+        self.copy_of_test_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="copy",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+        bread = Ingredient(
+            id="bread",
+            macronutrients=MacroNutrients(carbohydrates=50, proteins=10, fats=5),
+            kilocalories=250,
+        )
+        self.bread_recipe = Recipe(
+            id=RecipeId("34567812345678123456781234567812"),
+            name="bread",
+            ingredients=[(100, bread)],
+            yield_=1,
+        )
+        self.more_bread_recipe = Recipe(
+            id=RecipeId("45678123456781234567812345678123"),
+            name="more bread",
+            ingredients=[(101, bread)],
+            yield_=1,
+        )
+
+    def test_representatives(self):
+        recipes = [
+            test_recipe,
+            self.bread_recipe,
+            self.copy_of_test_recipe,
+            self.more_bread_recipe,
+        ]
+
+        self.assertEqual(
+            equivalent_recipe_representatives(recipes),
+            [test_recipe, self.bread_recipe, self.more_bread_recipe],
+        )
+        self.assertEqual(
+            equivalent_recipe_representatives(recipes, epsilon=3),
+            [test_recipe, self.bread_recipe],
+        )
+
+    def test_search_over_representatives(self):
+        select_recipes = mock.Mock(return_value=[test_recipe])
+        preferences = KilocaloriesPreferences(100)
+
+        select_recipes_collapsed(
+            [test_recipe, self.copy_of_test_recipe], 2, preferences, select_recipes
+        )
+
+        select_recipes.assert_called_once_with([test_recipe], 2, preferences)
+
+    def test_other_preferences_are_not_collapsed(self):
+        select_recipes = mock.Mock(return_value=[test_recipe])
+        recipes = [test_recipe, self.copy_of_test_recipe]
+
+        def preferences(menu):
+            return 0
+
+        select_recipes_collapsed(recipes, 2, preferences, select_recipes)
+
+        select_recipes.assert_called_once_with(recipes, 2, preferences)
+
+    def test_top_menus_over_representatives(self):
+        other_copy_of_test_recipe = Recipe(
+            id=RecipeId("56781234567812345678123456781234"),
+            name="other copy",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+        recipes = [
+            test_recipe,
+            self.bread_recipe,
+            self.copy_of_test_recipe,
+            self.more_bread_recipe,
+            other_copy_of_test_recipe,
+        ]
+
+        for preferences in [None, KilocaloriesPreferences(600)]:
+            for count in range(1, 12):
+                with self.subTest(preferences=preferences, count=count):
+                    self.assertEqual(
+                        select_menus_collapsed(recipes, 3, preferences, count),
+                        select_menus_branch_and_bound(recipes, 3, preferences, count),
+                    )
+
+
+class MeetInTheMiddleTestCase(unittest.TestCase):
+    def test_invalid_size_raises_error(self):
+        self.assertRaises(
+            ValueError, select_recipes_meet_in_the_middle, [test_recipe], 0
+        )
+
+    def test_two_macro_preferences_fall_back(self):
+        preferences = DietaryPreferenceCombination(
+            [MacroPreferences(1, 2, 3), MacroPreferences(3, 2, 1)]
+        )
+        with mock.patch(
+            "create_menu.select_recipes_branch_and_bound",
+            return_value=[test_recipe],
+        ) as fallback:
+            select_recipes_meet_in_the_middle([test_recipe], 2, preferences)
+
+        fallback.assert_called_once_with([test_recipe], 2, preferences)
+
+
+class SearchMonitorTestCase(unittest.TestCase):
+    def test_branch_and_bound_progress(self):
+        recipes = [
+            Recipe(
+                id=RecipeId(int=i),
+                name=f"recipe {i}",
+                ingredients=[(10 * (i + 1), test_ingredient)],
+                yield_=1,
+            )
+            for i in range(5)
+        ]
+        reports: list[SearchProgress] = []
+
+        with monitored(SearchMonitor(on_progress=reports.append, interval=0)):
+            select_recipes_branch_and_bound(recipes, 3, lambda menu: len(menu))
+
+        self.assertTrue(reports)
+        self.assertEqual(
+            [r.evaluated for r in reports], sorted(r.evaluated for r in reports)
+        )
+        self.assertEqual(reports[-1].best_cost, 3)
+
+    def test_progress_is_throttled(self):
+        reports: list[SearchProgress] = []
+        monitor = SearchMonitor(on_progress=reports.append, interval=60)
+
+        for evaluated in range(100):
+            monitor.checkpoint(evaluated, 0, 1.0)
+
+        self.assertEqual(reports, [])
+
+    def test_no_best_menu_yet(self):
+        reports: list[SearchProgress] = []
+        monitor = SearchMonitor(on_progress=reports.append, interval=0)
+
+        monitor.checkpoint(0, 0, float("inf"))
+
+        self.assertIsNone(reports[0].best_cost)
+
+
+class EstimateMenuSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recipes = [
+            Recipe(
+                id=RecipeId(int=i),
+                name=f"recipe {i}",
+                ingredients=[
+                    (
+                        100,
+                        Ingredient(
+                            id=str(i),
+                            macronutrients=MacroNutrients(i, i, i),
+                            kilocalories=10 * i,
+                        ),
+                    )
+                ],
+                yield_=1,
+            )
+            for i in range(10)
+        ]
+
+    def test_candidates(self):
+        estimate = estimate_menu_search(self.recipes, 3)
+
+        self.assertEqual(estimate.candidates, 220)
+
+    def test_nutrition_targets(self):
+        estimate = estimate_menu_search(self.recipes, 4, KilocaloriesPreferences(10))
+
+        self.assertEqual(
+            set(estimate.seconds),
+            {"vectorized", "branch-and-bound", "meet-in-the-middle", "local-search"},
+        )
+        self.assertEqual(estimate.engine, "meet-in-the-middle")
+
+    def test_fastest_exact_engine(self):
+        estimate = estimate_menu_search(self.recipes, 4, lambda menu: 0)
+
+        self.assertNotIn("meet-in-the-middle", estimate.seconds)
+        self.assertEqual(estimate.engine, "vectorized")
+
+    def test_over_budget_falls_back_to_heuristic(self):
+        estimate = estimate_menu_search(self.recipes, 30, lambda menu: 0, budget=1)
+
+        self.assertEqual(estimate.engine, "local-search")
+
+    def test_nothing_within_budget(self):
+        estimate = estimate_menu_search(self.recipes, 30, lambda menu: 0, budget=0)
+
+        self.assertIsNone(estimate.engine)
+
+    def test_top_menus(self):
+        estimate = estimate_menu_search(self.recipes, 3, count=3)
+
+        self.assertEqual(list(estimate.seconds), ["branch-and-bound"])
+        self.assertEqual(estimate.engine, "branch-and-bound")
+
+    def test_top_menus_over_representatives(self):
+        # 70 recipes, but only 10 different ones.
+        estimate = estimate_menu_search(self.recipes * 7, 7, budget=1, count=3)
+
+        self.assertEqual(estimate.engine, "branch-and-bound")
+
+    def test_huge_search(self):
+        estimate = estimate_menu_search(self.recipes * 100, 500)
+
+        self.assertEqual(estimate.seconds["vectorized"], float("inf"))
+
+
+class MenuScorerTestCase(unittest.TestCase):
+    def test_cost_matches_preferences(self):
+        bread = Ingredient(
+            id="bread",
+            macronutrients=MacroNutrients(
+                carbohydrates=50,
+                proteins=8,
+                fats=3,
+            ),
+            kilocalories=260,
+        )
+        bread_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="bread",
+            ingredients=[(80, bread), (1, test_ingredient)],
+            yield_=3,
+        )
+        recipes = [test_recipe, bread_recipe]
+        preferences = DietaryPreferenceCombination(
+            [
+                MacroPreferences(40, 10, 5),
+                # Not additive, falls back to calling it on the menu.
+                lambda menu: len(menu),
+                KilocaloriesPreferences(500),
+            ]
+        )
+
+        scorer = MenuScorer(recipes, 3, preferences)
+        totals = scorer.initial_totals()
+        for i in [0, 1, 1]:
+            totals = scorer.add(totals, i)
+        menu = [test_recipe, bread_recipe, bread_recipe]
+
+        self.assertEqual(scorer.cost(totals, menu), preferences(menu))
+
+
+class MenuCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = MenuCache(max_entries=2, ttl=10, clock=lambda: self.now)
+        self.menus = [Menu(id=mock.sentinel.id, meals=[test_recipe])]
+
+    def test_hit(self):
+        self.cache.put((1, 0, ()), 1, self.menus)
+
+        self.assertIs(self.cache.get((1, 0, ()), 1), self.menus)
+
+    def test_other_catalogue_version_misses(self):
+        self.cache.put((1, 0, ()), 1, self.menus)
+
+        self.assertIsNone(self.cache.get((1, 0, ()), 2))
+
+    def test_expired_entry_misses(self):
+        self.cache.put((1, 0, ()), 1, self.menus)
+        self.now = 11
+
+        self.assertIsNone(self.cache.get((1, 0, ()), 1))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put((1, 0, ()), 1, self.menus)
+        self.cache.put((2, 0, ()), 1, self.menus)
+        self.cache.get((1, 0, ()), 1)
+        self.cache.put((3, 0, ()), 1, self.menus)
+
+        self.assertIsNotNone(self.cache.get((1, 0, ()), 1))
+        self.assertIsNone(self.cache.get((2, 0, ()), 1))
+
+    def test_update(self):
+        menus = [Menu(id=mock.sentinel.other_id, meals=[test_recipe])]
+        self.cache.put((1, 0, ()), 1, self.menus)
+
+        self.cache.update((1, 0, ()), 1, 2, menus)
+
+        self.assertIs(self.cache.get((1, 0, ()), 2), menus)
+
+    def test_update_of_other_version_is_ignored(self):
+        self.cache.put((1, 0, ()), 2, self.menus)
+
+        self.cache.update((1, 0, ()), 1, 3, [])
+
+        self.assertIs(self.cache.get((1, 0, ()), 2), self.menus)
+
+    def test_key_ignores_preferences_order(self):
+        restrict = DietaryPreferenceDTO(
+            type_="restrict-ingredient", parameters={"ingredient_id": "egg"}
+        )
+        kilocalories = DietaryPreferenceDTO(
+            type_="kilocalories-preferences", parameters={"kilocalories": 100}
+        )
+
+        self.assertEqual(
+            menu_request_key(3, [restrict, kilocalories]),
+            menu_request_key(3, [kilocalories, restrict]),
+        )
+        self.assertNotEqual(
+            menu_request_key(3, [restrict]), menu_request_key(4, [restrict])
+        )
+
+
 class TestCreateMenuUseCase(unittest.TestCase):
     def test_no_recipes(self):
         mock_recipe_repo = mock.create_autospec(RecipeRepository)
@@ -165,6 +695,282 @@ class TestCreateMenuUseCase(unittest.TestCase):
             self.assertRaises(DietaryPreferenceNotValid, use_case, 1, [])
         mock_menu_repo.add.assert_not_called()
 
+    def test_uses_given_solver(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        select_recipes = mock.Mock(return_value=[test_recipe])
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo, select_recipes)
+        menu = use_case(1, [])
+
+        self.assertEqual(menu.meals, [test_recipe])
+        mock_menu_repo.add.assert_called_once_with(menu)
+
+    def test_cancelled_search_adds_no_menu(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        cancelled = threading.Event()
+        cancelled.set()
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo)
+
+        self.assertRaises(
+            SearchCancelled, use_case, 3, [], monitor=SearchMonitor(cancelled)
+        )
+        mock_menu_repo.add.assert_not_called()
+
+    def test_search_over_budget(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo, budget=0)
+
+        self.assertRaises(MenuSearchTooExpensive, use_case, 3, [])
+        self.assertRaises(MenuSearchTooExpensive, use_case, 3, [], alternatives=1)
+        mock_menu_repo.add.assert_not_called()
+
+    def test_alternatives_over_budget_dropped(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [
+            Recipe(
+                id=RecipeId(int=i),
+                name=f"recipe {i}",
+                ingredients=[
+                    (
+                        100,
+                        Ingredient(
+                            id=str(i),
+                            macronutrients=MacroNutrients(i, i, i),
+                            kilocalories=10 * i,
+                        ),
+                    )
+                ],
+                yield_=1,
+            )
+            for i in range(10)
+        ]
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo, budget=1)
+        menu = use_case(30, [], alternatives=2)
+
+        self.assertEqual(len(menu.meals), 30)
+        self.assertEqual(menu.alternatives, [])
+        self.assertEqual(use_case.estimate(30, [], 2).engine, "local-search")
+
+    def test_heuristic_menu_within_budget_is_not_cached(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        mock_recipe_repo.version.return_value = 1
+        cache = MenuCache()
+
+        use_case = CreateMenuUseCase(
+            mock_recipe_repo, mock_menu_repo, cache=cache, budget=0.1
+        )
+        with mock.patch(
+            "create_menu.estimate_menu_search",
+            return_value=MenuEstimate(1, {}, "local-search"),
+        ):
+            menu = use_case(3, [])
+
+        self.assertEqual(menu.meals, [test_recipe] * 3)
+        self.assertEqual(menu.optimality_gap, 0)
+        self.assertIsNone(cache.get(menu_request_key(3, []), 1))
+
+    def test_sum_index_tried_before_solver(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        select_recipes = mock.Mock(return_value=[test_recipe])
+        preferences = [
+            DietaryPreferenceDTO(
+                type_="kilocalories-preferences", parameters={"kilocalories": 100}
+            )
+        ]
+
+        use_case = CreateMenuUseCase(
+            mock_recipe_repo,
+            mock_menu_repo,
+            select_recipes,
+            sum_index=MenuSumIndex([test_recipe], max_size=1),
+        )
+        one_meal = use_case(1, preferences)
+        two_meals = use_case(2, preferences)
+
+        self.assertEqual(one_meal.meals, [test_recipe])
+        self.assertEqual(two_meals.meals, [test_recipe])
+        select_recipes.assert_called_once()
+        self.assertEqual(select_recipes.call_args.args[1], 2)
+
+    def test_batch_solves_identical_requests_once(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        select_recipes = mock.Mock(
+            side_effect=lambda recipes, size, _: [test_recipe] * size
+        )
+        invalid = [DietaryPreferenceDTO(type_="invalid", parameters={})]
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo, select_recipes)
+        results = list(
+            use_case.batch(
+                [
+                    MenuRequestDTO(2, []),
+                    MenuRequestDTO(1, []),
+                    MenuRequestDTO(1, invalid),
+                    MenuRequestDTO(2, []),
+                ]
+            )
+        )
+
+        self.assertEqual(
+            [len(r.meals) for r in results if isinstance(r, Menu)], [2, 1, 2]
+        )
+        self.assertIsInstance(results[2], DietaryPreferenceNotValid)
+        self.assertNotEqual(results[0].id, results[3].id)
+        self.assertEqual(select_recipes.call_count, 2)
+        mock_recipe_repo.all.assert_called_once()
+        self.assertEqual(mock_menu_repo.add.call_count, 3)
+
+    def test_batch_searches_identical_recipes_once(self):
+        copy_of_test_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="copy",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe, copy_of_test_recipe]
+        select_recipes = mock.Mock(return_value=[test_recipe])
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo, select_recipes)
+        [_, ranked] = use_case.batch(
+            [MenuRequestDTO(1, []), MenuRequestDTO(1, [], alternatives=1)]
+        )
+
+        self.assertEqual(select_recipes.call_args.args[0], [test_recipe])
+        self.assertEqual(ranked.alternatives[0].meals, [copy_of_test_recipe])
+
+    def test_forbidden_recipes_are_removed_before_search(self):
+        forbidden_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="forbidden",
+            ingredients=[(1, test_ingredient)],
+            yield_=1,
+        )
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [forbidden_recipe, test_recipe]
+        mock_recipe_repo.find_ids_by_ingredient.return_value = {forbidden_recipe.id}
+        select_recipes = mock.Mock(return_value=[test_recipe])
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo, select_recipes)
+        use_case(
+            1,
+            [
+                DietaryPreferenceDTO(
+                    type_="restrict-ingredient",
+                    parameters={"ingredient_id": "Test"},
+                )
+            ],
+        )
+
+        mock_recipe_repo.find_ids_by_ingredient.assert_called_once_with("Test")
+        self.assertEqual(select_recipes.call_args.args[0], [test_recipe])
+
+    def test_reports_cost_and_gap(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        preferences = [
+            DietaryPreferenceDTO(
+                type_="kilocalories-preferences", parameters={"kilocalories": 100}
+            )
+        ]
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo)
+        exact_menu = use_case(2, preferences)
+        anytime_menu = use_case(2, preferences, deadline_ms=10)
+
+        self.assertEqual(exact_menu.cost, 100)
+        self.assertEqual(exact_menu.optimality_gap, 0)
+        self.assertEqual(anytime_menu.meals, [test_recipe, test_recipe])
+        self.assertEqual(anytime_menu.cost, 100)
+        self.assertEqual(anytime_menu.optimality_gap, 0)
+
+    def test_deadline_counts_from_arrival(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo)
+        with mock.patch(
+            "create_menu.select_recipes_local_search",
+            side_effect=select_recipes_local_search,
+        ) as local_search:
+            use_case(2, [], deadline_ms=100, started=time.monotonic() - 1)
+
+        self.assertEqual(local_search.call_args.kwargs["time_limit"], 0)
+
+    def test_alternatives(self):
+        other_recipe = Recipe(
+            id=RecipeId("23456781234567812345678123456781"),
+            name="other",
+            ingredients=[(100, test_ingredient)],
+            yield_=1,
+        )
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe, other_recipe]
+
+        use_case = CreateMenuUseCase(mock_recipe_repo, mock_menu_repo)
+        menu = use_case(2, [], alternatives=2)
+
+        self.assertEqual(menu.meals, [test_recipe, test_recipe])
+        self.assertEqual(
+            [m.meals for m in menu.alternatives],
+            [[test_recipe, other_recipe], [other_recipe, other_recipe]],
+        )
+        self.assertEqual(mock_menu_repo.add.call_count, 3)
+
+    def test_cached_menu_skips_search(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        mock_recipe_repo.version.return_value = 1
+        select_recipes = mock.Mock(return_value=[test_recipe])
+
+        use_case = CreateMenuUseCase(
+            mock_recipe_repo, mock_menu_repo, select_recipes, cache=MenuCache()
+        )
+        first_menu = use_case(1, [])
+        second_menu = use_case(1, [])
+
+        select_recipes.assert_called_once()
+        self.assertNotEqual(first_menu.id, second_menu.id)
+        self.assertEqual(first_menu.meals, second_menu.meals)
+        mock_menu_repo.add.assert_called_with(second_menu)
+
+    def test_catalogue_change_invalidates_cache(self):
+        mock_recipe_repo = mock.create_autospec(RecipeRepository)
+        mock_menu_repo = mock.create_autospec(MenuRepository)
+        mock_recipe_repo.all.return_value = [test_recipe]
+        mock_recipe_repo.version.side_effect = [1, 2]
+        select_recipes = mock.Mock(return_value=[test_recipe])
+
+        use_case = CreateMenuUseCase(
+            mock_recipe_repo, mock_menu_repo, select_recipes, cache=MenuCache()
+        )
+        use_case(1, [])
+        use_case(1, [])
+
+        self.assertEqual(select_recipes.call_count, 2)
+
     def test_preference_type_error(self):
         mock_recipe_repo = mock.create_autospec(RecipeRepository)
         mock_menu_repo = mock.create_autospec(MenuRepository)
@@ -141,6 +141,64 @@ class RecipeTestCase(TestCase):
         kilocalories = test_recipe.kilocalories_per_serving()
         self.assertEqual(kilocalories, 5)
 
+    def test_recipe_nutrition_is_computed_once(self):
+        test_recipe = Recipe(
+            id=RecipeId("12345678123456781234567812345678"),
+            name="test",
+            ingredients=[(100, test_ingredient)],
+            yield_=1,
+        )
+
+        with mock.patch.object(
+            Recipe, "_compute_per_serving", side_effect=AssertionError
+        ):
+            test_recipe.macros_per_serving()
+            test_recipe.kilocalories_per_serving()
+
+    def test_recipe_nutrition_updated_on_yield_change(self):
+        test_ingredient = Ingredient(
+            id="Test",
+            macronutrients=MacroNutrients(
+                carbohydrates=10,
+                proteins=10,
+                fats=10,
+            ),
+            kilocalories=10,
+        )
+        test_recipe = Recipe(
+            id=RecipeId("12345678123456781234567812345678"),
+            name="test",
+            ingredients=[(100, test_ingredient)],
+            yield_=1,
+        )
+
+        test_recipe.yield_ = 2
+
+        self.assertEqual(test_recipe.macros_per_serving().carbohydrates, 5)
+        self.assertEqual(test_recipe.kilocalories_per_serving(), 5)
+
+    def test_recipe_nutrition_updated_on_ingredients_change(self):
+        test_ingredient = Ingredient(
+            id="Test",
+            macronutrients=MacroNutrients(
+                carbohydrates=10,
+                proteins=10,
+                fats=10,
+            ),
+            kilocalories=10,
+        )
+        test_recipe = Recipe(
+            id=RecipeId("12345678123456781234567812345678"),
+            name="test",
+            ingredients=[(100, test_ingredient)],
+            yield_=1,
+        )
+
+        test_recipe.ingredients = [(300, test_ingredient)]
+
+        self.assertEqual(test_recipe.macros_per_serving().proteins, 30)
+        self.assertEqual(test_recipe.kilocalories_per_serving(), 30)
+
 
 class TestGetRecipeUseCase(TestCase):
     def test_non_existing_recipe_id(self):
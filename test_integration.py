@@ -1,13 +1,32 @@
+import multiprocessing
+import os
+import tempfile
+import threading
 import unittest
+from concurrent.futures import Executor
+from itertools import combinations_with_replacement
+from unittest import mock
+from uuid import uuid4
 
 from create_menu import (
     select_recipes_brute_force,
+    select_recipes_branch_and_bound,
+    select_recipes_vectorized,
+    select_recipes_parallel,
+    select_menus_branch_and_bound,
+    select_recipes_collapsed,
+    select_recipes_meet_in_the_middle,
+    MenuSumIndex,
+    MenuCache,
+    Menu,
+    menu_request_key,
     Recipe,
     DietaryPreferenceDTO,
     CreateMenuUseCase,
     GetMenuUseCase,
 )
 from create_recipes import (
+    IngredientNotFound,
     GetRecipeUseCase,
     CreateRecipeUseCase,
     RecipeDTO,
@@ -16,11 +35,23 @@ from create_recipes import (
     Ingredient,
     IngredientId,
 )
-from preferences import RestrictIngredient, MacroPreferences, KilocaloriesPreferences
+from preferences import (
+    create_preferences,
+    RestrictIngredient,
+    MacroPreferences,
+    KilocaloriesPreferences,
+    DietaryPreferenceCombination,
+)
 from repositories import (
     InMemoryIngredientRepository,
     InMemoryRecipeRepository,
     InMemoryMenuRepository,
+    SQLiteConnectionPool,
+    SQLiteIngredientRepository,
+    SQLiteMenuRepository,
+    SQLiteRecipeRepository,
+    BoundedMenuRepository,
+    menu_footprint,
 )
 
 
@@ -129,6 +160,387 @@ class TestCreateMenuIntegration(unittest.TestCase):
         self.assertNotIn(hamburger_recipe, menu)
 
 
+def make_recipes(count: int) -> list[Recipe]:
+    """Builds `count` recipes out of the ingredients in the data folder."""
+    ingredients = [
+        i
+        for i in InMemoryIngredientRepository.from_file(
+            "data/ingredients.json"
+        ).ingredients.values()
+        if None not in i.macronutrients and i.kilocalories is not None
+    ]
+    return [
+        Recipe(
+            id=RecipeId(int=i),
+            name=f"recipe {i}",
+            ingredients=[
+                (50 + 25 * (j % 4), ingredients[(7 * i + 3 * j) % len(ingredients)])
+                for j in range(3)
+            ],
+            yield_=1 + i % 3,
+        )
+        for i in range(count)
+    ]
+
+
+class TestBranchAndBoundMatchesBruteForce(unittest.TestCase):
+    def setUp(self):
+        self.recipes = make_recipes(12)
+
+    def select_recipes(self, recipes, size, preferences):
+        return select_recipes_branch_and_bound(recipes, size, preferences)
+
+    def assertSameMenu(self, size, preferences):
+        self.assertEqual(
+            self.select_recipes(self.recipes, size, preferences),
+            select_recipes_brute_force(self.recipes, size, preferences),
+        )
+
+    def test_macro_preferences(self):
+        self.assertSameMenu(3, MacroPreferences(150, 80, 60))
+
+    def test_kilocalories_preferences(self):
+        self.assertSameMenu(4, KilocaloriesPreferences(2000))
+
+    def test_combined_preferences(self):
+        self.assertSameMenu(
+            3,
+            DietaryPreferenceCombination(
+                [
+                    RestrictIngredient(self.recipes[0].ingredients[0][1].id),
+                    MacroPreferences(100, 50, 40),
+                    KilocaloriesPreferences(1500),
+                ]
+            ),
+        )
+
+    def test_all_recipes_forbidden(self):
+        self.assertSameMenu(
+            2,
+            DietaryPreferenceCombination(
+                [
+                    RestrictIngredient(i.id)
+                    for recipe in self.recipes
+                    for _, i in recipe.ingredients
+                ]
+            ),
+        )
+
+
+class TestTopMenusMatchBruteForce(unittest.TestCase):
+    def test_ranked_like_sorted_combinations(self):
+        recipes = make_recipes(8)
+        preferences = DietaryPreferenceCombination(
+            [MacroPreferences(100, 50, 40), KilocaloriesPreferences(1500)]
+        )
+        # `sorted` is stable, draws keep the order they are tested in.
+        expected = sorted(combinations_with_replacement(recipes, 3), key=preferences)[
+            :10
+        ]
+
+        menus = select_menus_branch_and_bound(recipes, 3, preferences, 10)
+
+        self.assertEqual([meals for _, meals in menus], [list(m) for m in expected])
+        self.assertEqual(
+            [cost for cost, _ in menus], [preferences(m) for m in expected]
+        )
+
+    def test_including_recipe(self):
+        recipes = make_recipes(8)
+        preferences = KilocaloriesPreferences(1200)
+        expected = sorted(
+            (m for m in combinations_with_replacement(recipes, 3) if recipes[3] in m),
+            key=preferences,
+        )[:5]
+
+        menus = select_menus_branch_and_bound(recipes, 3, preferences, 5, recipes[3])
+
+        self.assertEqual([meals for _, meals in menus], [list(m) for m in expected])
+
+    def test_fewer_combinations_than_requested(self):
+        menus = select_menus_branch_and_bound(make_recipes(2), 2, None, 10)
+
+        self.assertEqual(len(menus), 3)
+
+
+class TestVectorizedMatchesBruteForce(TestBranchAndBoundMatchesBruteForce):
+    def select_recipes(self, recipes, size, preferences):
+        # Small chunks, so that draws span several of them.
+        return select_recipes_vectorized(recipes, size, preferences, chunk_size=7)
+
+
+class TestParallelMatchesBruteForce(TestBranchAndBoundMatchesBruteForce):
+    def select_recipes(self, recipes, size, preferences):
+        return select_recipes_parallel(
+            recipes, size, preferences, max_workers=2, chunk_size=5
+        )
+
+    def test_workers_started_from_fork_server(self):
+        recipes = make_recipes(6)
+        preferences = KilocaloriesPreferences(1500)
+
+        self.assertEqual(
+            select_recipes_parallel(
+                recipes,
+                3,
+                preferences,
+                max_workers=2,
+                mp_context=multiprocessing.get_context("forkserver"),
+            ),
+            select_recipes_brute_force(recipes, 3, preferences),
+        )
+
+
+class TestCollapsedMatchesBruteForce(TestBranchAndBoundMatchesBruteForce):
+    def setUp(self):
+        # Same recipes under other names, interleaved with the originals.
+        recipes = make_recipes(6)
+        duplicates = [
+            Recipe(
+                id=RecipeId(int=100 + i),
+                name=f"copy of {recipe.name}",
+                ingredients=list(recipe.ingredients),
+                yield_=recipe.yield_,
+            )
+            for i, recipe in enumerate(recipes)
+        ]
+        self.recipes = [r for pair in zip(duplicates, recipes) for r in pair]
+
+    def select_recipes(self, recipes, size, preferences):
+        return select_recipes_collapsed(recipes, size, preferences)
+
+
+class TestMeetInTheMiddleMatchesBruteForce(TestBranchAndBoundMatchesBruteForce):
+    def assertSameMenu(self, size, preferences):
+        # Draws may be broken differently, compare costs only.
+        menu = select_recipes_meet_in_the_middle(
+            self.recipes, size, preferences, chunk_size=5
+        )
+        expected = select_recipes_brute_force(self.recipes, size, preferences)
+
+        self.assertEqual(len(menu), size)
+        self.assertAlmostEqual(preferences(menu), preferences(expected), places=6)
+
+    def test_all_recipes_forbidden(self):
+        preferences = DietaryPreferenceCombination(
+            [
+                RestrictIngredient(i.id)
+                for recipe in self.recipes
+                for _, i in recipe.ingredients
+            ]
+        )
+
+        self.assertRaises(
+            ValueError,
+            select_recipes_meet_in_the_middle,
+            self.recipes,
+            2,
+            preferences,
+        )
+
+    def test_odd_size(self):
+        self.assertSameMenu(5, MacroPreferences(200, 100, 80))
+
+    def test_single_meal(self):
+        self.assertSameMenu(1, KilocaloriesPreferences(300))
+
+
+class TestMenuSumIndexMatchesBruteForce(TestMeetInTheMiddleMatchesBruteForce):
+    def assertSameMenu(self, size, preferences):
+        menu = MenuSumIndex(self.recipes, max_size=5).nearest(size, preferences)
+
+        self.assertEqual(
+            menu, select_recipes_brute_force(self.recipes, size, preferences)
+        )
+
+    def test_draws(self):
+        # Copies of the recipes make every menu tie with others.
+        copies = [
+            Recipe(
+                id=RecipeId(int=100 + i),
+                name=recipe.name,
+                ingredients=recipe.ingredients,
+                yield_=recipe.yield_,
+            )
+            for i, recipe in enumerate(self.recipes)
+        ]
+        recipes = [*copies[6:], *self.recipes, *copies[:6]]
+        repo = InMemoryRecipeRepository([])
+        index = MenuSumIndex(repo.all(), rebuild_ratio=0.5)
+        repo.subscribe(index.add)
+        preferences = KilocaloriesPreferences(1500)
+
+        for recipe in recipes:
+            repo.add(recipe)
+            self.assertEqual(
+                index.nearest(3, preferences),
+                select_recipes_brute_force(repo.all(), 3, preferences),
+            )
+
+    def test_all_recipes_forbidden(self):
+        preferences = DietaryPreferenceCombination(
+            [
+                RestrictIngredient(i.id)
+                for recipe in self.recipes
+                for _, i in recipe.ingredients
+            ]
+        )
+
+        self.assertIsNone(MenuSumIndex(self.recipes).nearest(2, preferences))
+
+    def test_size_not_indexed(self):
+        index = MenuSumIndex(self.recipes, max_size=2)
+
+        self.assertIsNone(index.nearest(3, KilocaloriesPreferences(1500)))
+
+    def test_recipes_added_to_repository(self):
+        repo = InMemoryRecipeRepository([])
+        index = MenuSumIndex(repo.all(), rebuild_ratio=0.5)
+        repo.subscribe(index.add)
+        preferences = DietaryPreferenceCombination(
+            [MacroPreferences(100, 50, 40), KilocaloriesPreferences(1500)]
+        )
+
+        for recipe in self.recipes:
+            repo.add(recipe)
+            expected = select_recipes_brute_force(repo.all(), 3, preferences)
+            self.assertAlmostEqual(
+                preferences(index.nearest(3, preferences)),
+                preferences(expected),
+                places=6,
+            )
+
+    def test_recipe_replaced(self):
+        index = MenuSumIndex(self.recipes)
+        replacement = Recipe(
+            id=self.recipes[0].id,
+            name="replacement",
+            ingredients=self.recipes[1].ingredients,
+            yield_=self.recipes[1].yield_,
+        )
+        recipes = [replacement, *self.recipes[1:]]
+        preferences = KilocaloriesPreferences(900)
+
+        index.add(replacement)
+
+        self.assertNotIn(self.recipes[0], index.nearest(2, preferences))
+        self.assertAlmostEqual(
+            preferences(index.nearest(2, preferences)),
+            preferences(select_recipes_brute_force(recipes, 2, preferences)),
+            places=6,
+        )
+
+    def test_memory_footprint(self):
+        small = MenuSumIndex(self.recipes[:4]).memory_footprint()
+
+        self.assertGreater(MenuSumIndex(self.recipes).memory_footprint(), small)
+
+
+class TestCachedMenusFollowAddedRecipes(unittest.TestCase):
+    def test_ranked_like_sorted_combinations(self):
+        recipes = make_recipes(9)
+        recipe_repo = InMemoryRecipeRepository([])
+        for recipe in recipes[:4]:
+            recipe_repo.add(recipe)
+        cache = MenuCache()
+        create_menu = CreateMenuUseCase(
+            recipe_repo, InMemoryMenuRepository(), cache=cache
+        )
+        recipe_repo.subscribe(create_menu.recipe_added)
+        preferences_spec = [
+            DietaryPreferenceDTO(
+                type_="restrict-ingredient",
+                parameters={"ingredient_id": recipes[7].ingredients[0][1].id},
+            ),
+            DietaryPreferenceDTO(
+                type_="kilocalories-preferences", parameters={"kilocalories": 1500}
+            ),
+        ]
+        preferences = create_preferences(preferences_spec)
+        key = menu_request_key(3, preferences_spec, 3)
+        create_menu(3, preferences_spec, alternatives=3)
+
+        for recipe in recipes[4:]:
+            recipe_repo.add(recipe)
+
+            expected = sorted(
+                (
+                    list(m)
+                    for m in combinations_with_replacement(recipe_repo.all(), 3)
+                    if preferences(m) < float("inf")
+                ),
+                key=preferences,
+            )[:4]
+            menus = cache.get(key, recipe_repo.version())
+            self.assertEqual([m.meals for m in menus], expected)
+            self.assertEqual(
+                [m.cost for m in menus], [preferences(m) for m in expected]
+            )
+
+    def test_replaced_recipe_in_menus_expires_entry(self):
+        recipes = make_recipes(4)
+        recipe_repo = InMemoryRecipeRepository([])
+        for recipe in recipes:
+            recipe_repo.add(recipe)
+        cache = MenuCache()
+        create_menu = CreateMenuUseCase(
+            recipe_repo, InMemoryMenuRepository(), cache=cache
+        )
+        recipe_repo.subscribe(create_menu.recipe_added)
+        menu = create_menu(1, [])
+
+        recipe_repo.add(
+            Recipe(
+                id=menu.meals[0].id,
+                name="replacement",
+                ingredients=recipes[1].ingredients,
+                yield_=2,
+            )
+        )
+
+        self.assertIsNone(cache.get(menu_request_key(1, []), recipe_repo.version()))
+
+    def test_search_over_budget_expires_entry(self):
+        recipes = make_recipes(5)
+        recipe_repo = InMemoryRecipeRepository([])
+        for recipe in recipes[:4]:
+            recipe_repo.add(recipe)
+        cache = MenuCache()
+        CreateMenuUseCase(recipe_repo, InMemoryMenuRepository(), cache=cache)(
+            3, [], alternatives=1
+        )
+        create_menu = CreateMenuUseCase(
+            recipe_repo, InMemoryMenuRepository(), cache=cache, budget=0
+        )
+        recipe_repo.subscribe(create_menu.recipe_added)
+
+        recipe_repo.add(recipes[4])
+
+        key = menu_request_key(3, [], 1)
+        self.assertIsNone(cache.get(key, recipe_repo.version()))
+
+    def test_searched_on_executor(self):
+        recipes = make_recipes(5)
+        recipe_repo = InMemoryRecipeRepository([])
+        for recipe in recipes[:4]:
+            recipe_repo.add(recipe)
+        cache = MenuCache()
+        executor = mock.create_autospec(Executor)
+        create_menu = CreateMenuUseCase(
+            recipe_repo, InMemoryMenuRepository(), cache=cache, executor=executor
+        )
+        recipe_repo.subscribe(create_menu.recipe_added)
+        create_menu(3, [], alternatives=1)
+
+        recipe_repo.add(recipes[4])
+        key = menu_request_key(3, [], 1)
+
+        self.assertEqual(cache.entries_for(recipe_repo.version()), [])
+        update, *args = executor.submit.call_args.args
+        update(*args)
+        self.assertIsNotNone(cache.get(key, recipe_repo.version()))
+
+
 class TestGetRecipeUseCaseE2E(unittest.TestCase):
     def setUp(self):
         self.get_recipe = GetRecipeUseCase(
@@ -140,6 +552,319 @@ class TestGetRecipeUseCaseE2E(unittest.TestCase):
         self.assertEqual(recipe.name, "tepid salad")
 
 
+class TestRecipeRepositoryIngredientIndex(unittest.TestCase):
+    def test_find_ids_by_ingredient(self):
+        repo = InMemoryRecipeRepository([])
+        for recipe in [salad_recipe, chicken_sandwich_recipe, hamburger_recipe]:
+            repo.add(recipe)
+
+        self.assertEqual(
+            repo.find_ids_by_ingredient("chicken"),
+            {salad_recipe.id, chicken_sandwich_recipe.id},
+        )
+        self.assertEqual(repo.find_ids_by_ingredient("tofu"), set())
+
+    def test_replaced_recipe_is_reindexed(self):
+        repo = InMemoryRecipeRepository([])
+        repo.add(salad_recipe)
+        repo.add(
+            Recipe(
+                id=salad_recipe.id,
+                name="Lettuce salad",
+                ingredients=[(100, lettuce)],
+                yield_=1,
+            )
+        )
+
+        self.assertEqual(repo.find_ids_by_ingredient("chicken"), set())
+        self.assertEqual(repo.find_ids_by_ingredient("lettuce"), {salad_recipe.id})
+
+
+class TestRecipeRepositoryIngredients(unittest.TestCase):
+    def setUp(self):
+        self.ingredient_repo = InMemoryIngredientRepository.from_file(
+            "data/ingredients.json"
+        )
+        self.onions = self.ingredient_repo.find("Onions, red, raw")
+
+    def recipe_info(self, ingredient):
+        return {
+            "id": str(uuid4()),
+            "name": "onions",
+            "yield": 1,
+            "ingredients": [[150, ingredient]],
+        }
+
+    def embedded(self, ingredient):
+        return {
+            "id": ingredient.id,
+            "macronutrients": ingredient.macronutrients._asdict(),
+            "kilocalories": ingredient.kilocalories,
+        }
+
+    def test_embedded_ingredients_shared(self):
+        repo = InMemoryRecipeRepository(
+            [self.recipe_info(self.embedded(self.onions)) for _ in range(2)]
+        )
+        first, second = repo.all()
+
+        self.assertIs(first.ingredients[0][1], second.ingredients[0][1])
+
+    def test_embedded_ingredients_resolved(self):
+        repo = InMemoryRecipeRepository(
+            [self.recipe_info(self.embedded(self.onions))], self.ingredient_repo
+        )
+
+        self.assertIs(repo.all()[0].ingredients[0][1], self.onions)
+
+    def test_embedded_ingredients_differing_from_repository_kept(self):
+        ingredient = self.embedded(self.onions)
+        ingredient["kilocalories"] += 1
+        repo = InMemoryRecipeRepository(
+            [self.recipe_info(ingredient)], self.ingredient_repo
+        )
+
+        self.assertEqual(
+            repo.all()[0].ingredients[0][1].kilocalories, self.onions.kilocalories + 1
+        )
+
+    def test_normalized_ingredients(self):
+        repo = InMemoryRecipeRepository(
+            [self.recipe_info(self.onions.id)], self.ingredient_repo
+        )
+
+        self.assertIs(repo.all()[0].ingredients[0][1], self.onions)
+
+    def test_unknown_normalized_ingredient(self):
+        self.assertRaises(
+            IngredientNotFound,
+            InMemoryRecipeRepository,
+            [self.recipe_info("unknown")],
+            self.ingredient_repo,
+        )
+
+
+class TestSQLiteRepositories(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "meal_planner.sqlite3")
+        self.pool = self.open_pool()
+        self.recipe_repo = SQLiteRecipeRepository(self.pool)
+
+    def open_pool(self):
+        pool = SQLiteConnectionPool(self.path, size=2)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_recipes(self):
+        for recipe in [salad_recipe, chicken_sandwich_recipe]:
+            self.recipe_repo.add(recipe)
+
+        self.assertEqual(self.recipe_repo.find(salad_recipe.id), salad_recipe)
+        self.assertIsNone(self.recipe_repo.find(hamburger_recipe.id))
+        self.assertEqual(
+            self.recipe_repo.all(), [salad_recipe, chicken_sandwich_recipe]
+        )
+        self.assertEqual(self.recipe_repo.version(), 2)
+
+    def test_found_ingredients_in_order(self):
+        self.recipe_repo.add(chicken_sandwich_recipe)
+        # Store the ingredient rows last first.
+        with self.pool.transaction() as connection:
+            rows = connection.execute(
+                "SELECT * FROM recipe_ingredients ORDER BY position DESC"
+            ).fetchall()
+            connection.execute("DELETE FROM recipe_ingredients")
+            connection.executemany(
+                "INSERT INTO recipe_ingredients VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+        self.assertEqual(
+            self.recipe_repo.find(chicken_sandwich_recipe.id), chicken_sandwich_recipe
+        )
+
+    def test_replaced_recipe_keeps_its_place(self):
+        for recipe in [salad_recipe, chicken_sandwich_recipe]:
+            self.recipe_repo.add(recipe)
+        self.recipe_repo.all()
+        lettuce_salad = Recipe(
+            id=salad_recipe.id,
+            name="Lettuce salad",
+            ingredients=[(100, lettuce)],
+            yield_=1,
+        )
+        self.recipe_repo.add(lettuce_salad)
+
+        self.assertEqual(
+            self.recipe_repo.all(), [lettuce_salad, chicken_sandwich_recipe]
+        )
+        self.assertEqual(
+            self.recipe_repo.find_ids_by_ingredient("chicken"),
+            {chicken_sandwich_recipe.id},
+        )
+        self.assertEqual(
+            self.recipe_repo.find_ids_by_ingredient("lettuce"),
+            {salad_recipe.id, chicken_sandwich_recipe.id},
+        )
+
+    def test_recipes_share_ingredients(self):
+        for recipe in [salad_recipe, chicken_sandwich_recipe]:
+            self.recipe_repo.add(recipe)
+        first, second = self.recipe_repo.all()
+
+        self.assertIs(first.ingredients[0][1], second.ingredients[0][1])
+
+    def test_listeners(self):
+        added = []
+        self.recipe_repo.subscribe(added.append)
+        self.recipe_repo.add(salad_recipe)
+
+        self.assertEqual(added, [salad_recipe])
+
+    def test_persisted(self):
+        self.recipe_repo.add(salad_recipe)
+        self.pool.close()
+
+        recipe_repo = SQLiteRecipeRepository(self.open_pool())
+
+        self.assertEqual(recipe_repo.all(), [salad_recipe])
+        self.assertEqual(recipe_repo.version(), 1)
+
+    def test_concurrent_adds(self):
+        recipes = make_recipes(20)
+        threads = [
+            threading.Thread(target=self.recipe_repo.add, args=(r,)) for r in recipes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertCountEqual(
+            [r.id for r in self.recipe_repo.all()], [r.id for r in recipes]
+        )
+        self.assertEqual(self.recipe_repo.version(), 20)
+
+    def test_sum_index_follows_other_workers(self):
+        recipes = make_recipes(3)
+        self.recipe_repo.add(recipes[0])
+        # Another worker, sharing the database.
+        worker_repo = SQLiteRecipeRepository(self.open_pool())
+        index = MenuSumIndex(worker_repo.all(), version=worker_repo.version())
+        worker_repo.subscribe(index.add)
+        create_menu = CreateMenuUseCase(
+            worker_repo, InMemoryMenuRepository(), sum_index=index
+        )
+        worker_repo.add(recipes[1])
+        self.recipe_repo.add(recipes[2])
+        preferences_spec = [
+            DietaryPreferenceDTO(
+                type_="kilocalories-preferences",
+                parameters={"kilocalories": recipes[2].kilocalories_per_serving()},
+            )
+        ]
+
+        menu = create_menu(1, preferences_spec)
+
+        self.assertEqual([r.id for r in menu.meals], [recipes[2].id])
+        self.assertEqual(index.version, worker_repo.version())
+
+    def test_ingredients(self):
+        ingredient_repo = SQLiteIngredientRepository(self.pool)
+        ingredient_repo.add(bread, chicken)
+
+        self.assertEqual(ingredient_repo.find("bread"), bread)
+        self.assertIsNone(ingredient_repo.find("tofu"))
+        self.assertEqual(ingredient_repo.count(), 2)
+
+    def test_menus(self):
+        for recipe in [salad_recipe, chicken_sandwich_recipe, hamburger_recipe]:
+            self.recipe_repo.add(recipe)
+        menu_repo = SQLiteMenuRepository(self.pool, self.recipe_repo)
+        alternative = Menu(
+            id=uuid4(), meals=[hamburger_recipe], cost=2.0, optimality_gap=0.0
+        )
+        menu = Menu(
+            id=uuid4(),
+            meals=[salad_recipe, chicken_sandwich_recipe],
+            cost=1.0,
+            optimality_gap=0.0,
+            alternatives=[alternative],
+        )
+        menu_repo.add(menu)
+        menu_repo.add(alternative)
+
+        self.assertEqual(menu_repo.find(menu.id), menu)
+        self.assertEqual(menu_repo.find(alternative.id), alternative)
+        self.assertIsNone(menu_repo.find(uuid4()))
+
+
+class TestBoundedMenuRepository(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.menus = [Menu(id=uuid4(), meals=[salad_recipe]) for _ in range(3)]
+
+    def repository(self, **kwargs):
+        return BoundedMenuRepository(clock=lambda: self.now, **kwargs)
+
+    def test_least_recently_used_evicted(self):
+        repo = self.repository(max_menus=2)
+        first, second, third = self.menus
+        repo.add(first)
+        repo.add(second)
+        repo.find(first.id)
+        repo.add(third)
+
+        self.assertIsNone(repo.find(second.id))
+        self.assertIs(repo.find(first.id), first)
+        self.assertIs(repo.find(third.id), third)
+        stats = repo.stats()
+        self.assertEqual((stats.hits, stats.misses), (3, 1))
+        self.assertEqual((stats.evictions, stats.menus), (1, 2))
+
+    def test_max_bytes(self):
+        repo = self.repository(max_bytes=2 * menu_footprint(self.menus[0]))
+        for menu in self.menus:
+            repo.add(menu)
+
+        self.assertIsNone(repo.find(self.menus[0].id))
+        self.assertEqual(repo.stats().bytes, 2 * menu_footprint(self.menus[0]))
+
+    def test_unused_menus_expire(self):
+        repo = self.repository(ttl=10)
+        first, second, _ = self.menus
+        repo.add(first)
+        self.now = 5
+        repo.add(second)
+        self.now = 12
+
+        self.assertIsNone(repo.find(first.id))
+        self.assertIs(repo.find(second.id), second)
+        self.now = 21
+        self.assertIs(repo.find(second.id), second)
+        self.assertEqual(repo.stats().expirations, 1)
+
+    def test_evicted_menus_spilled(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        pool = SQLiteConnectionPool(os.path.join(directory.name, "menus.sqlite3"))
+        self.addCleanup(pool.close)
+        recipe_repo = InMemoryRecipeRepository([])
+        recipe_repo.add(salad_recipe)
+        repo = self.repository(
+            max_menus=1, spill=SQLiteMenuRepository(pool, recipe_repo)
+        )
+        first, second, _ = self.menus
+        first.alternatives = [second]
+        repo.add(first)
+        repo.add(second)
+
+        self.assertEqual(repo.find(first.id), first)
+        self.assertIs(repo.find(second.id), second)
+        self.assertEqual(repo.stats().spill_hits, 1)
+
+
 class TestCreateRecipeUseCaseE2E(unittest.TestCase):
     def setUp(self):
         repo = InMemoryRecipeRepository.from_file("data/recipes.json")
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+import unittest
+from dataclasses import fields
+from unittest import mock
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+import main
+from create_menu import CannotCreateMenu
+from create_recipes import Ingredient, MacroNutrients, Recipe
+
+recipe = Recipe(
+    id=uuid4(),
+    name="Onion soup",
+    ingredients=[(300, Ingredient("onions", MacroNutrients(9.3, 1.1, 0.1), 40))],
+    yield_=2,
+)
+
+
+def stub_services():
+    services = main.Services(**{f.name: mock.Mock() for f in fields(main.Services)})
+    services.get_recipe.return_value = recipe
+    services.shutdown = mock.Mock()  # type: ignore[method-assign]
+    return services
+
+
+class LifespanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.services = stub_services()
+        self.create_services = mock.Mock(return_value=self.services)
+        patcher = mock.patch("main.create_services", self.create_services)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        environ = mock.patch.dict(os.environ)
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def wait_for(self, client, path, status):
+        for _ in range(100):
+            if client.get(path).status_code == status:
+                return
+            time.sleep(0.01)
+        self.fail(f"{path} never answered {status}")
+
+    def test_ready_once_started(self):
+        with TestClient(main.app) as client:
+            self.assertEqual(client.get("/healthz").status_code, 200)
+            self.assertEqual(client.get("/readyz").status_code, 200)
+            response = client.get(f"/recipes/{recipe.id}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Onion soup")
+        self.services.shutdown.assert_called_once_with()
+
+    def test_not_started(self):
+        client = TestClient(main.app)
+
+        response = client.get(f"/recipes/{recipe.id}")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(client.get("/readyz").status_code, 503)
+
+    def test_background_startup(self):
+        os.environ["MEAL_PLANNER_BACKGROUND_STARTUP"] = "1"
+        release = threading.Event()
+        self.create_services.side_effect = lambda: release.wait() and self.services
+
+        with TestClient(main.app) as client:
+            self.assertEqual(client.get("/healthz").status_code, 200)
+            self.assertEqual(client.get("/readyz").status_code, 503)
+            response = client.get(f"/recipes/{recipe.id}")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "1")
+            release.set()
+            self.wait_for(client, "/readyz", 200)
+            self.assertEqual(client.get(f"/recipes/{recipe.id}").status_code, 200)
+
+    def test_background_startup_failed(self):
+        os.environ["MEAL_PLANNER_BACKGROUND_STARTUP"] = "1"
+        self.create_services.side_effect = ValueError()
+
+        with TestClient(main.app) as client:
+            self.wait_for(client, "/healthz", 500)
+            self.assertEqual(client.get("/readyz").status_code, 503)
+
+    def test_startup_failed(self):
+        self.create_services.side_effect = ValueError()
+
+        with self.assertRaises(ValueError), TestClient(main.app):
+            pass
+
+
+class MenuRequestTestCase(unittest.TestCase):
+    def test_alternatives_bounded(self):
+        services = stub_services()
+
+        with (
+            mock.patch("main.create_services", return_value=services),
+            TestClient(main.app) as client,
+        ):
+            response = client.post(
+                "/menus",
+                json={"size": 2, "alternatives": main.MENU_MAX_ALTERNATIVES + 1},
+            )
+
+        self.assertEqual(response.status_code, 422)
+        services.solver_pool.submit.assert_not_called()
+
+    def test_size_bounded(self):
+        services = stub_services()
+
+        with (
+            mock.patch("main.create_services", return_value=services),
+            TestClient(main.app) as client,
+        ):
+            response = client.post(
+                "/menus", json={"size": main.MENU_MAX_SIZE + 1, "deadline_ms": 100}
+            )
+
+        self.assertEqual(response.status_code, 422)
+        services.solver_pool.submit.assert_not_called()
+
+
+class SolverPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.pool = main.SolverPool(max_workers=1, max_queued=1)
+        # Cleanups run last first: workers are released, then shut down.
+        self.addCleanup(self.pool.executor.shutdown)
+        self.addCleanup(self.release.set)
+
+    def test_full(self):
+        self.pool.submit(self.release.wait)
+        self.pool.submit(self.release.wait)
+
+        self.assertRaises(main.SolverPoolFull, self.pool.submit, self.release.wait)
+
+    def test_slot_released_on_cancel(self):
+        self.pool.submit(self.release.wait)
+        queued = self.pool.submit(self.release.wait)
+
+        self.assertTrue(queued.cancel())
+        self.pool.submit(self.release.wait)
+
+    def test_menus_rejected_when_full(self):
+        services = stub_services()
+        services.solver_pool = self.pool
+        self.pool.submit(self.release.wait)
+        self.pool.submit(self.release.wait)
+
+        with (
+            mock.patch("main.create_services", return_value=services),
+            TestClient(main.app) as client,
+        ):
+            response = client.post("/menus", json={"size": 2})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        services.create_menu.assert_not_called()
+
+    def test_batch_rejected_when_full(self):
+        services = stub_services()
+        services.solver_pool = self.pool
+        self.pool.submit(self.release.wait)
+        self.pool.submit(self.release.wait)
+
+        with (
+            mock.patch("main.create_services", return_value=services),
+            TestClient(main.app) as client,
+        ):
+            response = client.post("/menus/batch", json=[{"size": 2}])
+
+        self.assertEqual(response.status_code, 503)
+        services.create_menu.batch.assert_not_called()
+
+    def test_batch_timed_out(self):
+        services = stub_services()
+        services.solver_pool = self.pool
+
+        def batch(requests, monitor):
+            yield CannotCreateMenu()
+            # Searches the second menu until cancelled.
+            monitor.cancelled.wait()
+
+        services.create_menu.batch.side_effect = batch
+
+        with (
+            mock.patch("main.create_services", return_value=services),
+            mock.patch("main.MENU_SOLVE_TIMEOUT", 0.1),
+            TestClient(main.app) as client,
+        ):
+            response = client.post("/menus/batch", json=[{"size": 2}, {"size": 3}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.json()], [500, 504])
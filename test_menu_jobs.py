@@ -0,0 +1,100 @@
+import threading
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+from create_menu import CannotCreateMenu, MenuRequestDTO
+from menu_jobs import (
+    MenuJobNotFound,
+    MenuJobQueue,
+    MenuJobQueueFull,
+    MenuJobStatus,
+)
+
+
+class MenuJobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+        def create_menu(*args, **kwargs):
+            self.started.set()
+            self.release.wait()
+            return mock.sentinel.menu
+
+        self.create_menu = mock.Mock(side_effect=create_menu)
+        self.queue = MenuJobQueue(
+            self.create_menu, workers=1, max_queued=1, ttl=10, clock=lambda: self.now
+        )
+
+    def tearDown(self):
+        self.release.set()
+        self.queue.shutdown()
+
+    def wait_for(self, job):
+        """Lets every job run, returns `job` once finished."""
+        self.release.set()
+        self.queue.executor.shutdown(wait=True)
+        return self.queue.find(job.id)
+
+    def test_done(self):
+        job = self.queue.submit(MenuRequestDTO(3, []))
+
+        job = self.wait_for(job)
+
+        self.assertEqual(job.status, MenuJobStatus.DONE)
+        self.assertIs(job.menu, mock.sentinel.menu)
+        self.create_menu.assert_called_once_with(3, [], None, 0, monitor=mock.ANY)
+
+    def test_failed(self):
+        self.create_menu.side_effect = CannotCreateMenu()
+        job = self.queue.submit(MenuRequestDTO(3, []))
+
+        job = self.wait_for(job)
+
+        self.assertEqual(job.status, MenuJobStatus.FAILED)
+        self.assertIsInstance(job.error, CannotCreateMenu)
+
+    def test_unexpected_error_logged(self):
+        self.create_menu.side_effect = RuntimeError()
+
+        with self.assertLogs("menu_jobs", "ERROR"):
+            job = self.wait_for(self.queue.submit(MenuRequestDTO(3, [])))
+
+        self.assertEqual(job.status, MenuJobStatus.FAILED)
+        self.assertIsInstance(job.error, RuntimeError)
+
+    def test_identical_requests_in_flight_share_job(self):
+        job = self.queue.submit(MenuRequestDTO(3, []))
+
+        self.assertIs(self.queue.submit(MenuRequestDTO(3, [])), job)
+        self.assertIsNot(self.queue.submit(MenuRequestDTO(4, [])), job)
+        self.wait_for(job)
+        self.create_menu.assert_has_calls(
+            [
+                mock.call(3, [], None, 0, monitor=mock.ANY),
+                mock.call(4, [], None, 0, monitor=mock.ANY),
+            ]
+        )
+
+    def test_requests_with_deadline_are_not_shared(self):
+        job = self.queue.submit(MenuRequestDTO(3, [], deadline_ms=100))
+
+        self.assertIsNot(self.queue.submit(MenuRequestDTO(3, [], deadline_ms=100)), job)
+
+    def test_full(self):
+        self.queue.submit(MenuRequestDTO(3, []))
+        self.started.wait()
+        self.queue.submit(MenuRequestDTO(4, []))
+
+        self.assertRaises(MenuJobQueueFull, self.queue.submit, MenuRequestDTO(5, []))
+
+    def test_finished_job_expires(self):
+        job = self.wait_for(self.queue.submit(MenuRequestDTO(3, [])))
+        self.now = 11
+
+        self.assertRaises(MenuJobNotFound, self.queue.find, job.id)
+
+    def test_not_found(self):
+        self.assertRaises(MenuJobNotFound, self.queue.find, uuid4())
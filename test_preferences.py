@@ -7,6 +7,8 @@ from preferences import (
     DietaryPreferenceCombination,
     create_preferences,
     DietaryPreferenceDTO,
+    AdditivePreference,
+    sum_contributions,
 )
 from create_menu import Recipe
 from create_recipes import Ingredient, IngredientId, RecipeId, MacroNutrients
@@ -48,6 +50,13 @@ class RestrictIngredientTestCase(unittest.TestCase):
 
         self.assertEqual(cost, float("inf"))
 
+    def test_lower_bound_forbidden_partial_menu(self):
+        preference = RestrictIngredient(IngredientId("forbid"))
+
+        bound = preference.lower_bound([test_recipe], [test_recipe], 2)
+
+        self.assertEqual(bound, float("inf"))
+
 
 class MacroPreferencesTestCase(unittest.TestCase):
     def test_lower_carbs(self):
@@ -126,6 +135,29 @@ class MacroPreferencesTestCase(unittest.TestCase):
         # We are spot-on on protein and 50 carbs over, that's the cost.
         self.assertEqual(cost, 50)
 
+    def test_lower_bound(self):
+        bread = Ingredient(
+            id="bread",
+            macronutrients=MacroNutrients(
+                carbohydrates=100,
+                proteins=0,
+                fats=0,
+            ),
+            kilocalories=0,
+        )
+        bread_recipe = Recipe(
+            id=RecipeId("12345678123456781234567812345678"),
+            name="test",
+            ingredients=[(100, bread)],
+            yield_=1,
+        )
+
+        preference = MacroPreferences(50, 0, 0)
+        bound = preference.lower_bound([bread_recipe], [bread_recipe, test_recipe], 3)
+
+        # Already 50 carbs over, whatever the remaining two meals are.
+        self.assertEqual(bound, 50)
+
 
 class KilocaloriesPreferencesTestCase(unittest.TestCase):
     def test_lower(self):
@@ -203,6 +235,29 @@ class KilocaloriesPreferencesTestCase(unittest.TestCase):
         # We are 50 kcal over (from chicken).
         self.assertEqual(cost, 50)
 
+    def test_lower_bound(self):
+        bread = Ingredient(
+            id="bread",
+            macronutrients=MacroNutrients(
+                carbohydrates=100,
+                proteins=0,
+                fats=0,
+            ),
+            kilocalories=100,
+        )
+        bread_recipe = Recipe(
+            id=RecipeId("12345678123456781234567812345678"),
+            name="bread",
+            ingredients=[(100, bread)],
+            yield_=1,
+        )
+
+        preference = KilocaloriesPreferences(500)
+        bound = preference.lower_bound([], [bread_recipe], 3)
+
+        # Three breads are the most we can get, 200 kcal short.
+        self.assertEqual(bound, 200)
+
 
 class PreferencesCombinationTestCase(unittest.TestCase):
     def test_empty(self):
@@ -223,6 +278,51 @@ class PreferencesCombinationTestCase(unittest.TestCase):
         # Sum of 1 and 2.
         self.assertEqual(cost, 3)
 
+    def test_lower_bound_ignores_unbounded_preferences(self):
+        preference = DietaryPreferenceCombination(
+            [
+                lambda x: 1,
+                RestrictIngredient(IngredientId("forbid")),
+            ]
+        )
+        bound = preference.lower_bound([test_recipe], [test_recipe], 1)
+
+        self.assertEqual(bound, float("inf"))
+
+
+class AdditivePreferenceTestCase(unittest.TestCase):
+    def test_finalize_matches_call(self):
+        bread = Ingredient(
+            id="bread",
+            macronutrients=MacroNutrients(
+                carbohydrates=100,
+                proteins=3,
+                fats=1,
+            ),
+            kilocalories=250,
+        )
+        bread_recipe = Recipe(
+            id=RecipeId("12345678123456781234567812345678"),
+            name="bread",
+            ingredients=[(70, bread)],
+            yield_=3,
+        )
+        menu = [bread_recipe, test_recipe, bread_recipe]
+
+        for preference in [
+            RestrictIngredient(IngredientId("forbid")),
+            RestrictIngredient(IngredientId("allow")),
+            MacroPreferences(10, 20, 30),
+            KilocaloriesPreferences(300),
+        ]:
+            with self.subTest(preference=preference):
+                self.assertIsInstance(preference, AdditivePreference)
+                totals = sum_contributions(preference, menu)
+                self.assertEqual(preference.finalize(totals), preference(menu))
+
+    def test_lambda_is_not_additive(self):
+        self.assertNotIsInstance(lambda x: 0, AdditivePreference)
+
 
 class CreatePreferencesTestCase(unittest.TestCase):
     def test_invalid_type(self):
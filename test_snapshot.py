@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+from create_recipes import Ingredient, MacroNutrients, Recipe
+from snapshot import (
+    CatalogueSnapshot,
+    SnapshotIngredientRepository,
+    SnapshotNotValid,
+    SnapshotRecipeRepository,
+    export_snapshot,
+)
+
+onions = Ingredient("onions", MacroNutrients(9.3, 1.1, 0.1), 40)
+garlic = Ingredient("garlic", MacroNutrients(33.1, 6.4, 0.5), 149)
+unknown = Ingredient("unknown", MacroNutrients(None, None, None), None)  # type: ignore[arg-type]
+# Differs from the catalogue's garlic.
+roasted_garlic = Ingredient("garlic", MacroNutrients(35, 7, 0.6), 160)
+
+onion_soup = Recipe(uuid4(), "Onion soup", [(300, onions), (10, garlic)], 2)
+garlic_bread = Recipe(uuid4(), "Garlic bread", [(50, roasted_garlic)], 4)
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "catalogue.snapshot")
+        export_snapshot(
+            self.path, [onions, garlic, unknown], [onion_soup, garlic_bread]
+        )
+        self.snapshot = CatalogueSnapshot(self.path)
+
+    def test_ingredients(self):
+        repo = SnapshotIngredientRepository(self.snapshot)
+
+        self.assertEqual(repo.find("garlic"), garlic)
+        self.assertEqual(repo.find("unknown"), unknown)
+        self.assertIsNone(repo.find("tofu"))
+
+    def test_recipes(self):
+        repo = SnapshotRecipeRepository(self.snapshot)
+
+        self.assertEqual(repo.all(), [onion_soup, garlic_bread])
+        self.assertEqual(repo.find(garlic_bread.id), garlic_bread)
+        self.assertIsNone(repo.find(uuid4()))
+        self.assertEqual(
+            repo.find_ids_by_ingredient("garlic"), {onion_soup.id, garlic_bread.id}
+        )
+
+    def test_recipes_built_on_access(self):
+        repo = SnapshotRecipeRepository(self.snapshot)
+        recipe = repo.find(garlic_bread.id)
+
+        self.assertEqual(repo.recipes, [None, recipe])
+        self.assertIs(repo.find(garlic_bread.id), recipe)
+
+    def test_recipes_share_ingredients(self):
+        repo = SnapshotRecipeRepository(self.snapshot)
+
+        self.assertIs(
+            repo.all()[0].ingredients[0][1],
+            SnapshotIngredientRepository(self.snapshot).find("onions"),
+        )
+
+    def test_nutrition(self):
+        self.assertEqual(
+            self.snapshot.nutrition.tolist(),
+            [
+                [*r.macros_per_serving(), r.kilocalories_per_serving()]
+                for r in [onion_soup, garlic_bread]
+            ],
+        )
+
+    def test_recipes_built_with_nutrition(self):
+        repo = SnapshotRecipeRepository(self.snapshot)
+
+        with mock.patch.object(Recipe, "_compute_per_serving") as compute:
+            recipe = repo.find(onion_soup.id)
+
+        compute.assert_not_called()
+        self.assertEqual(recipe.macros_per_serving(), onion_soup.macros_per_serving())
+        self.assertEqual(
+            recipe.kilocalories_per_serving(), onion_soup.kilocalories_per_serving()
+        )
+
+    def test_added_recipes(self):
+        repo = SnapshotRecipeRepository(self.snapshot)
+        repo.find_ids_by_ingredient("garlic")
+        added = []
+        repo.subscribe(added.append)
+        onions_only = Recipe(onion_soup.id, "Onion soup", [(300, onions)], 2)
+        garlic_soup = Recipe(uuid4(), "Garlic soup", [(100, garlic)], 2)
+        repo.add(onions_only)
+        repo.add(garlic_soup)
+
+        self.assertEqual(repo.all(), [onions_only, garlic_bread, garlic_soup])
+        self.assertEqual(
+            repo.find_ids_by_ingredient("garlic"), {garlic_bread.id, garlic_soup.id}
+        )
+        self.assertEqual(added, [onions_only, garlic_soup])
+        self.assertEqual(repo.version(), 2)
+
+    def test_not_valid(self):
+        with open(self.path, "wb") as f:
+            f.write(b"[]" * 100)
+
+        self.assertRaises(SnapshotNotValid, CatalogueSnapshot, self.path)